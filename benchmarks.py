@@ -0,0 +1,583 @@
+"""
+Rough benchmarks for `oneaway`, run as ``python benchmarks.py [<name> ...]``.
+
+Uses `/usr/share/dict/words` as the corpus where it exists, otherwise a synthetic vocabulary of
+random lowercase words whose lengths roughly follow those of English dictionary words.
+
+Benchmarks which `record` their results can be saved with ``--save <path>`` and later compared
+against with ``--compare <path>``, which is what ``make bench`` and ``make bench-baseline`` do.
+"""
+import argparse
+import functools
+import json
+import os
+import random
+import string
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterator, List, Set
+
+import oneaway
+
+# Roughly the distribution of word lengths in /usr/share/dict/words, lengths 2 to 15.
+WORD_LENGTHS = (2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15)
+WORD_LENGTH_WEIGHTS = (1, 3, 6, 10, 13, 14, 14, 12, 9, 7, 5, 3, 2, 1)
+
+
+def corpus(size: int, *, seed: int = 1) -> List[str]:
+    words: List[str] = []
+    if os.path.exists("/usr/share/dict/words"):
+        with open("/usr/share/dict/words", "r") as dictionary:
+            words = [
+                word
+                for word in (line.strip().lower() for line in dictionary)
+                if word.isascii() and word.isalpha()
+            ]
+    rng = random.Random(seed)
+    if len(words) >= size:
+        return rng.sample(words, size)
+    lengths = rng.choices(WORD_LENGTHS, WORD_LENGTH_WEIGHTS, k=size - len(words))
+    return words + [
+        "".join(rng.choices(string.ascii_lowercase, k=length)) for length in lengths
+    ]
+
+
+def timed(func: Callable[[], int]) -> Dict[str, float]:
+    start = time.perf_counter()
+    count = func()
+    elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "variants": count, "variants_per_sec": count / elapsed}
+
+
+def best_of(func: Callable[[], int], *, repeat: int = 3) -> Dict[str, float]:
+    return max(
+        (timed(func) for _ in range(repeat)), key=lambda result: result["variants_per_sec"]
+    )
+
+
+def peak_memory(func: Callable[[], int]) -> int:
+    """Peak bytes allocated while running `func`, which is run separately from `timed` because
+    tracing allocations slows everything down."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+RESULTS: Dict[str, Dict[str, float]] = {}
+
+
+def record(name: str, result: Dict[str, float]) -> None:
+    RESULTS[name] = result
+    sys.stdout.write(
+        f"{name:<28} {result['seconds']:.2f}s  {result['variants_per_sec']:>12,.0f} variants/sec"
+        f"  {result['peak_bytes'] / 1024:>8,.0f}KiB peak{os.linesep}"
+    )
+
+
+def compare(baseline: Dict[str, Dict[str, float]], *, tolerance: float = 0.1) -> int:
+    """Report the change in variants/sec against `baseline`, returning how many regressed."""
+    regressions = 0
+    for name, result in RESULTS.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["variants_per_sec"]
+        change = (result["variants_per_sec"] - before) / before
+        marker = ""
+        if change < -tolerance:
+            marker = "  (slower!)"
+            regressions += 1
+        sys.stdout.write(f"{name:<28} {change:>+7.1%}{marker}{os.linesep}")
+    return regressions
+
+
+GENERATORS: Dict[str, Callable[[str], Iterator[str]]] = {
+    "dropped_letter": oneaway.dropped_letter,
+    "swapped_letter": oneaway.swapped_letter,
+    "swapped_casing": oneaway.swapped_casing,
+    "horizontal_proximity_typo": oneaway.horizontal_proximity_typo,
+    "vertical_proximity_typo": oneaway.vertical_proximity_typo,
+    "common": oneaway.common,
+    "mix": oneaway.mix,
+}
+
+
+def bench_generators(size: int = 50_000) -> None:
+    """Every generator and preset over a dictionary sized corpus"""
+    words = corpus(size)
+    for name, generator in GENERATORS.items():
+
+        def run() -> int:
+            return sum(1 for word in words for _ in generator(word))
+
+        result = best_of(run)
+        result["peak_bytes"] = peak_memory(run)
+        record(name, result)
+    for length in (3, 6, 10, 15):
+        sized = [word for word in words if len(word) == length]
+        if not sized:
+            continue
+        # Short words are rare, but cheap, so make sure there's enough work to time.
+        sized *= max(1, 20_000 // (len(sized) * length))
+
+        def run() -> int:
+            return sum(1 for word in sized for _ in oneaway.mix(word))
+
+        result = best_of(run)
+        result["peak_bytes"] = peak_memory(run)
+        record(f"mix (length {length})", result)
+
+
+def bench_parallel(size: int = 200_000) -> None:
+    """How `parallel` scales with the number of worker processes, against a plain `batch`"""
+    words = corpus(size)
+    result = timed(lambda: sum(1 for _ in oneaway.batch(words, oneaway.MIX_HANDLERS)))
+    sys.stdout.write(
+        f"batch      workers=-  {result['seconds']:.2f}s  "
+        f"{result['variants_per_sec']:,.0f} variants/sec{os.linesep}"
+    )
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        result = timed(
+            lambda: sum(
+                1
+                for _ in oneaway.parallel(
+                    words, oneaway.MIX_HANDLERS, workers=workers, chunksize=2000
+                )
+            )
+        )
+        sys.stdout.write(
+            f"parallel   workers={workers}  {result['seconds']:.2f}s  "
+            f"{result['variants_per_sec']:,.0f} variants/sec{os.linesep}"
+        )
+        workers *= 2
+
+
+def bench_indexes(size: int = 50_000) -> None:
+    """Build time, size and lookup speed of `TypoIndex` against `SymmetricDeleteIndex`"""
+    words = corpus(size)
+    typos = [typo for _, typo in oneaway.batch(words[:1000], oneaway.MIX_HANDLERS)]
+    for index_class in (oneaway.TypoIndex, oneaway.SymmetricDeleteIndex):
+        start = time.perf_counter()
+        index = index_class(words)
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        for typo in typos:
+            index.lookup(typo)
+        lookups = len(typos) / (time.perf_counter() - start)
+        sys.stdout.write(
+            f"{index_class.__name__:<22} built in {built:.2f}s  {len(index):,} keys  "
+            f"{index.memory_usage() / 1024 / 1024:.1f}MiB  {lookups:,.0f} lookups/sec{os.linesep}"
+        )
+
+
+def bench_layouts(rounds: int = 50) -> None:
+    """`proximity_typo` given an Enum member, against a pre-compiled layout"""
+    words = corpus(1000)
+    for name, layout in (
+        ("enum", oneaway.Proximities.QWERTY_HORIZONTAL),
+        ("compiled", oneaway.CompiledLayout(oneaway.Proximities.QWERTY_HORIZONTAL)),
+    ):
+        result = timed(
+            lambda: sum(
+                sum(1 for _ in oneaway.proximity_typo(word, layout=layout))
+                for _ in range(rounds)
+                for word in words
+            )
+        )
+        sys.stdout.write(
+            f"{name:<10} {result['seconds']:.2f}s  "
+            f"{result['variants_per_sec']:,.0f} variants/sec{os.linesep}"
+        )
+
+
+def bench_known(size: int = 50_000) -> None:
+    """`known_variants` walking a `Trie`, against generating everything and checking a set"""
+    words = corpus(size)
+    typos = [typo for _, typo in oneaway.batch(words[:2000], oneaway.MIX_HANDLERS)]
+    for name, dictionary in (("set", set(words)), ("trie", oneaway.Trie(words))):
+        result = timed(
+            lambda: sum(
+                1 for typo in typos for _ in oneaway.known_variants(typo, dictionary)
+            )
+        )
+        sys.stdout.write(
+            f"{name:<6} {result['seconds']:.2f}s  {len(typos) / result['seconds']:,.0f} "
+            f"words/sec  {result['variants']:,.0f} known variants{os.linesep}"
+        )
+
+
+def bench_patterns(size: int = 500) -> None:
+    """Compiling & matching a flat `|` alternation of variations, against `variants_pattern`"""
+    import re
+
+    words = [word for word in corpus(size * 5) if len(word) >= 8][:size]
+    variations = [[typo for typo in oneaway.mix(word) if typo] for word in words]
+    text = " ".join(corpus(2_000, seed=2) + [typos[0] for typos in variations[::10]])
+    for name, build in (
+        ("flat", lambda typos: f"(?:{'|'.join(sorted(typos, key=len, reverse=True))})"),
+        ("factored", oneaway.variants_pattern),
+    ):
+        patterns = [build(typos) for typos in variations]
+        re.purge()
+        start = time.perf_counter()
+        compiled = [re.compile(pattern) for pattern in patterns]
+        compiling = time.perf_counter() - start
+        start = time.perf_counter()
+        matches = sum(len(pattern.findall(text)) for pattern in compiled)
+        matching = time.perf_counter() - start
+        sys.stdout.write(
+            f"{name:<9} {sum(map(len, patterns)) / len(patterns):>6,.0f} characters average  "
+            f"compiled in {compiling:.2f}s  matched {matches:,} in {matching:.2f}s{os.linesep}"
+        )
+
+
+def bench_startup(rounds: int = 10) -> None:
+    """Wall clock time of running the CLI for a single word, with & without a dictionary"""
+    import subprocess
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as cache:
+        dictionary = "/usr/share/dict/words"
+        if not os.path.exists(dictionary):
+            dictionary = os.path.join(cache, "words")
+            with open(dictionary, "w") as f:
+                f.write("\n".join(corpus(100_000)))
+        environment = {**os.environ, "XDG_CACHE_HOME": cache}
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "oneaway.py")
+        for name, arguments in (
+            ("no dictionary", ["--no-dictionary"]),
+            ("dictionary (first run)", ["--dictionary", dictionary]),
+            ("dictionary (snapshot)", ["--dictionary", dictionary]),
+        ):
+            times: List[float] = []
+            for _ in range(1 if "first" in name else rounds):
+                start = time.perf_counter()
+                subprocess.run(
+                    [sys.executable, script, "test", *arguments],
+                    env=environment,
+                    stdout=subprocess.DEVNULL,
+                    check=True,
+                )
+                times.append(time.perf_counter() - start)
+            sys.stdout.write(f"{name:<24} {min(times) * 1000:.0f}ms{os.linesep}")
+
+
+def bench_vectorised(size: int = 100_000) -> None:
+    """`batch` expanding same-length groups with numpy (if it's installed), against without"""
+    words = corpus(size)
+    minimum = oneaway._VECTORISED_MIN_GROUP
+    for name, group in (("python", size + 1), ("numpy", minimum)):
+        oneaway._VECTORISED_MIN_GROUP = group
+        try:
+            result = best_of(lambda: sum(1 for _ in oneaway.batch(words, oneaway.MIX_HANDLERS)))
+        finally:
+            oneaway._VECTORISED_MIN_GROUP = minimum
+        sys.stdout.write(
+            f"{name:<8} {result['seconds']:.2f}s  "
+            f"{result['variants_per_sec']:,.0f} variants/sec{os.linesep}"
+        )
+
+
+def bench_batch(size: int = 50_000) -> None:
+    """
+    `batch` with `MIX_HANDLERS`, with and without numpy, against looping over `mix` per word
+    """
+    words = list(dict.fromkeys(corpus(size)))
+    minimum = oneaway._VECTORISED_MIN_GROUP
+
+    def per_word() -> int:
+        return sum(1 for word in words for _ in oneaway.mix(word))
+
+    def batched() -> int:
+        return sum(1 for _ in oneaway.batch(words, oneaway.MIX_HANDLERS))
+
+    for name, run, group in (
+        ("mix per word", per_word, minimum),
+        ("batch", batched, len(words) + 1),
+        ("batch, numpy", batched, minimum),
+    ):
+        oneaway._VECTORISED_MIN_GROUP = group
+        try:
+            result = best_of(run)
+        finally:
+            oneaway._VECTORISED_MIN_GROUP = minimum
+        sys.stdout.write(
+            f"{name:<13} {result['seconds']:.2f}s  "
+            f"{result['variants_per_sec']:,.0f} variants/sec{os.linesep}"
+        )
+
+
+def bench_bytes(size: int = 50_000) -> None:
+    """`multiple_bytes`, against encoding everything `multiple` generates"""
+    words = corpus(size)
+    for name, run in (
+        (
+            "str, encoded",
+            lambda: sum(
+                1
+                for word in words
+                for typo in oneaway.multiple(word, oneaway.MIX_HANDLERS)
+                if typo.encode("ascii")
+            ),
+        ),
+        (
+            "bytes",
+            lambda: sum(
+                1 for word in words for _ in oneaway.multiple_bytes(word, oneaway.MIX_HANDLERS)
+            ),
+        ),
+    ):
+        result = best_of(run)
+        sys.stdout.write(
+            f"{name:<13} {result['seconds']:.2f}s  "
+            f"{result['variants_per_sec']:,.0f} variants/sec{os.linesep}"
+        )
+
+
+def bench_bloom(size: int = 200_000) -> None:
+    """Checking variants against a `BloomFilter` before the dictionary, against not"""
+    import tempfile
+
+    words = corpus(size)
+    typos = [typo for _, typo in oneaway.batch(words[:5000], oneaway.MIX_HANDLERS)]
+    bloom = oneaway.BloomFilter.from_words(words)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "words.idx")
+        oneaway.TypoIndex(words, handlers=()).save(path)
+        with oneaway.MappedTypoIndex(path) as mapped:
+            for name, dictionary in (("set", set(words)), ("mmap", mapped)):
+                for prefix, check in (
+                    ("", lambda: sum(1 for typo in typos if typo in dictionary)),
+                    (
+                        "bloom + ",
+                        lambda: sum(1 for _ in oneaway.filter_variants(typos, bloom, dictionary)),
+                    ),
+                ):
+                    result = best_of(check)
+                    sys.stdout.write(
+                        f"{prefix + name:<13} {len(typos) / result['seconds']:>12,.0f} "
+                        f"checks/sec{os.linesep}"
+                    )
+    sys.stdout.write(
+        f"bloom filter {bloom.memory_usage() / 1024:,.0f}KiB, set of words "
+        f"{(sys.getsizeof(set(words)) + sum(map(sys.getsizeof, words))) / 1024:,.0f}KiB"
+        f"{os.linesep}"
+    )
+
+
+def bench_one_away(size: int = 20_000) -> None:
+    """`is_one_away`, against checking membership of everything `mix` generates"""
+    words = corpus(size)
+    rng = random.Random(3)
+    pairs = [(word, typo) for word in words for typo in rng.sample(words, 3)]
+    pairs += oneaway.batch(words[: size // 10], oneaway.MIX_HANDLERS)
+    for name, check in (
+        ("in set(mix)", lambda a, b: b in set(oneaway.mix(a))),
+        ("is_one_away", oneaway.is_one_away),
+    ):
+        start = time.perf_counter()
+        found = sum(1 for a, b in pairs if check(a, b))
+        elapsed = time.perf_counter() - start
+        sys.stdout.write(
+            f"{name:<12} {len(pairs) / elapsed:>12,.0f} checks/sec  {found:,} one away{os.linesep}"
+        )
+
+
+def bench_matches(size: int = 50_000) -> None:
+    """
+    Finding the words a typo is one away from: `one_away_matches` walking a `Trie`, against
+    expanding the whole dictionary with `mix` into a `TypoIndex` and probing that
+    """
+    words = corpus(size)
+    typos = [typo for _, typo in oneaway.batch(words[:500], oneaway.MIX_HANDLERS)]
+    for name, build, lookup in (
+        ("TypoIndex", oneaway.TypoIndex, lambda index, typo: index.lookup(typo)),
+        (
+            "SymmetricDeleteIndex",
+            oneaway.SymmetricDeleteIndex,
+            lambda index, typo: index.lookup(typo),
+        ),
+        ("Trie", oneaway.Trie, lambda index, typo: tuple(oneaway.one_away_matches(typo, index))),
+    ):
+        peak = peak_memory(lambda: len(build(words)))
+        start = time.perf_counter()
+        index = build(words)
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        for typo in typos:
+            lookup(index, typo)
+        lookups = len(typos) / (time.perf_counter() - start)
+        sys.stdout.write(
+            f"{name:<21} built in {built:.2f}s  {peak / 1024 / 1024:,.0f}MiB peak  "
+            f"{lookups:,.0f} lookups/sec{os.linesep}"
+        )
+        del index
+
+
+def bench_join(size: int = 50_000) -> None:
+    """
+    Joining two word lists on being one typo apart: `fuzzy_join`, serially & across processes,
+    against checking `is_one_away` for every pair (on a small slice, extrapolated)
+    """
+    right = corpus(size)
+    left = [typo for _, typo in oneaway.batch(right[: size // 20], oneaway.MIX_HANDLERS)][::10]
+    sample = left[:20]
+    start = time.perf_counter()
+    for value in sample:
+        for other in right:
+            oneaway.is_one_away(other, value) or oneaway.is_one_away(value, other)
+    elapsed = time.perf_counter() - start
+    sys.stdout.write(f"{'every pair':<21} {len(sample) / elapsed:,.0f} left/sec{os.linesep}")
+    for name, processes in (("fuzzy_join", False), ("fuzzy_join, processes", True)):
+        start = time.perf_counter()
+        pairs = sum(1 for _ in oneaway.fuzzy_join(left, right, processes=processes))
+        elapsed = time.perf_counter() - start
+        sys.stdout.write(
+            f"{name:<21} {len(left) / elapsed:,.0f} left/sec  {pairs:,} pairs{os.linesep}"
+        )
+
+
+def bench_clusters(size: int = 100_000) -> None:
+    """
+    `clusters` of growing vocabularies, to check it stays close to linear in their size
+    """
+    words = corpus(size)
+    for count in (size // 8, size // 4, size // 2, size):
+        start = time.perf_counter()
+        groups = oneaway.clusters(words[:count])
+        elapsed = time.perf_counter() - start
+        sys.stdout.write(
+            f"{count:>9,} words  {elapsed:.2f}s  {count / elapsed:,.0f} words/sec  "
+            f"{len(groups):,} clusters{os.linesep}"
+        )
+
+
+def bench_fanout(size: int = 100_000) -> None:
+    """
+    `count_variants` against exhausting `mix` for every word, and the resulting fanout
+    histogram, i.e. how many words have each number of variants
+    """
+    words = corpus(size)
+    for name, count in (
+        ("exhausting mix", lambda word: len(set(oneaway.mix(word)))),
+        ("count_variants", oneaway.count_variants),
+    ):
+        start = time.perf_counter()
+        total = sum(count(word) for word in words)
+        elapsed = time.perf_counter() - start
+        sys.stdout.write(
+            f"{name:<15} {elapsed:.2f}s  {len(words) / elapsed:>10,.0f} words/sec  "
+            f"{total:,} variants{os.linesep}"
+        )
+    for variants, words_with in oneaway.fanout_histogram(words).items():
+        sys.stdout.write(f"  {variants:>4} variants: {words_with:,} words{os.linesep}")
+
+
+REPEATED_LETTER_WORDS = (
+    "letter",
+    "bookkeeper",
+    "committee",
+    "mississippi",
+    "balloon",
+    "assessment",
+    "possessiveness",
+    "aardvark",
+)
+
+
+def _partitioned_proximity_typo(value: str, /, *, layout: oneaway.Proximities) -> Iterator[str]:
+    """How `proximity_typo` used to splice, always at the first occurrence of each letter"""
+    seen: Set[str] = set()
+    for letter in value:
+        before, _, after = value.partition(letter)
+        for replacement_letter in layout.value[letter]:
+            new_value = f"{before}{replacement_letter}{after}"
+            if new_value not in seen:
+                yield new_value
+                seen.add(new_value)
+
+
+def bench_repeated_letters(rounds: int = 20_000) -> None:
+    """Correctness & speed of `proximity_typo` on words with repeated letters"""
+    layout = oneaway.Proximities.QWERTY_VERTICAL
+    for name, handler in (
+        ("partition", functools.partial(_partitioned_proximity_typo, layout=layout)),
+        (
+            "position",
+            functools.partial(oneaway.proximity_typo, layout=oneaway.CompiledLayout(layout)),
+        ),
+    ):
+        expected = missing = produced = 0
+        for word in REPEATED_LETTER_WORDS:
+            wanted = {
+                f"{word[:position]}{replacement}{word[position + 1:]}"
+                for position, letter in enumerate(word)
+                for replacement in layout.value[letter]
+            }
+            variants = set(handler(word))
+            expected += len(wanted)
+            missing += len(wanted - variants)
+            produced += len(variants)
+        result = timed(
+            lambda: sum(
+                sum(1 for _ in handler(word))
+                for _ in range(rounds)
+                for word in REPEATED_LETTER_WORDS
+            )
+        )
+        sys.stdout.write(
+            f"{name:<10} {produced}/{expected} variants, {missing} missing  "
+            f"{result['seconds']:.2f}s  {result['variants_per_sec']:,.0f} variants/sec{os.linesep}"
+        )
+
+
+BENCHMARKS: Dict[str, Callable[[], None]] = {
+    "generators": bench_generators,
+    "parallel": bench_parallel,
+    "indexes": bench_indexes,
+    "repeated": bench_repeated_letters,
+    "layouts": bench_layouts,
+    "known": bench_known,
+    "patterns": bench_patterns,
+    "startup": bench_startup,
+    "vectorised": bench_vectorised,
+    "batch": bench_batch,
+    "bytes": bench_bytes,
+    "bloom": bench_bloom,
+    "one_away": bench_one_away,
+    "matches": bench_matches,
+    "join": bench_join,
+    "clusters": bench_clusters,
+    "fanout": bench_fanout,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("names", nargs="*", help=f"Any of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--save", help="Write recorded results to this JSON file.")
+    parser.add_argument("--compare", help="Compare recorded results to this JSON file.")
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+    for name in args.names or BENCHMARKS:
+        sys.stdout.write(f"# {name}{os.linesep}")
+        BENCHMARKS[name]()
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(RESULTS, f, indent=2)
+    if args.compare:
+        if not os.path.exists(args.compare):
+            sys.stderr.write(
+                f"No baseline at {args.compare}, run `make bench-baseline`{os.linesep}"
+            )
+            sys.exit(1)
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        sys.stdout.write(f"# compared to {args.compare}{os.linesep}")
+        sys.exit(1 if compare(baseline) else 0)
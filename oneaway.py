@@ -6,18 +6,79 @@ distance of 1, I think?
 Does this work on long strings? Probably not. The Big-O time is probably horrible in various ways,
 but that's OK because I have only short strings to worry about. Famous last words 😅
 """
+import array
+import collections
 import enum
 import functools
-from types import MappingProxyType
-from typing import Set, Iterator, Sequence, Callable
+import heapq
+import importlib
+import importlib.util
+import itertools
+import math
+import mmap
+import os
+import re
+import struct
+import zlib
+import sys
+from types import MappingProxyType, ModuleType
+from typing import (
+    Set,
+    Iterator,
+    Iterable,
+    Sequence,
+    Callable,
+    Tuple,
+    List,
+    Optional,
+    Deque,
+    Dict,
+    Union,
+    Container,
+    TextIO,
+    Any,
+    Mapping,
+    Collection,
+)
 
 __all__ = [
     "dropped_letter",
     "swapped_letter",
     "proximity_typo",
+    "Proximities",
+    "UnknownCharacters",
+    "CompiledLayout",
     "multiple",
+    "batch",
+    "parallel",
+    "COMMON_HANDLERS",
+    "MIX_HANDLERS",
     "common",
     "mix",
+    "edits",
+    "DEFAULT_COSTS",
+    "ranked",
+    "order_by_hit_rate",
+    "Trie",
+    "known_variants",
+    "is_one_away",
+    "is_one_away_many",
+    "one_away_matches",
+    "count_variants",
+    "fanout_histogram",
+    "multiple_bytes",
+    "variants_pattern",
+    "compiled_pattern",
+    "fuzzy_join",
+    "clusters",
+    "cluster_sizes",
+    "load_dictionary",
+    "BloomFilter",
+    "filter_variants",
+    "cached",
+    "TypoIndex",
+    "MappedTypoIndex",
+    "SymmetricDeleteIndex",
     "aggregate",
     "amalgam",
     "solution",
@@ -68,6 +129,20 @@ def swapped_letter(value: str, /) -> Iterator[str]:
             seen.add(new_value)
 
 
+def _swapped_case(char: str) -> str:
+    """Flips the casing of a single character, for `swapped_casing`."""
+    if char.islower():
+        return char.upper()
+    elif char.isupper():
+        return char.lower()
+    raise ValueError(
+        "I didn't handle this, because I'm ignorant and monolingual and don't"
+        "have a good enough versing in unicode and normalization to have thought"
+        "through everything. Sorry.",
+        "Please open a ticket providing `value` which failed",
+    )
+
+
 def swapped_casing(value: str, /) -> Iterator[str]:
     """
     Generates variations on `value` where the user may have pressed shift/caps-lock incorrectly.
@@ -89,7 +164,7 @@ def swapped_casing(value: str, /) -> Iterator[str]:
                 "Split your sentence/fragment by whitespace and provide each word "
                 "as `value` individually",
             )
-        before, dropped, after = value.partition(char)
+        before, dropped, after = value[:position], char, value[position + 1 :]
         # is swapcase() the same thing? The docs don't actually say that it does _this_ under the
         # hood, but I assume so given `s.swapcase().swapcase()` may not be `s`
         #
@@ -102,17 +177,7 @@ def swapped_casing(value: str, /) -> Iterator[str]:
         #
         # The lowercasing & uppercasing algorithms used are described in section 3.13 of the
         # Unicode Standard... apparently.
-        if dropped.islower():
-            replacement = dropped.upper()
-        elif dropped.isupper():
-            replacement = dropped.lower()
-        else:
-            raise ValueError(
-                "I didn't handle this, because I'm ignorant and monolingual and don't"
-                "have a good enough versing in unicode and normalization to have thought"
-                "through everything. Sorry.",
-                "Please open a ticket providing `value` which failed",
-            )
+        replacement = _swapped_case(dropped)
         new_value = f"{before}{replacement}{after}"
         if new_value not in seen:
             yield new_value
@@ -188,25 +253,107 @@ class Proximities(enum.Enum):
         }
     )
 
+    def __reduce_ex__(self, protocol: object) -> Tuple[Callable[..., object], Tuple[object, str]]:
+        # Members are pickled by name, because the `MappingProxyType` values can't be pickled,
+        # which would otherwise stop the partials below being sent to other processes.
+        return getattr, (self.__class__, self.name)
 
-def proximity_typo(value: str, /, *, layout: Proximities) -> Iterator[str]:
-    """Generates variations on `value` where a letter may've been fat-fingered from `g` to `h` etc."""
-    seen: Set[str] = set()
-    for position, letter in enumerate(value):
-        before, dropped, after = value.partition(letter)
+
+class UnknownCharacters(enum.Enum):
+    """What a `CompiledLayout` does with characters which aren't on the keyboard layout."""
+
+    RAISE = "raise"
+    """Raise a `ValueError`, as `proximity_typo` always has."""
+    SKIP = "skip"
+    """Leave the character as it is, and generate no proximity typos for it."""
+
+
+class CompiledLayout:
+    """
+    A `Proximities` layout flattened into a tuple indexed by code point, so that finding the
+    neighbours of a letter is a single index rather than an Enum & mapping lookup.
+    If `fold_case` is set, uppercase letters get the uppercased neighbours of their lowercase
+    counterpart, rather than being unknown.
+    """
+
+    __slots__ = ("layout", "unknown", "fold_case", "table")
+
+    def __init__(
+        self,
+        layout: Proximities,
+        *,
+        unknown: UnknownCharacters = UnknownCharacters.RAISE,
+        fold_case: bool = False,
+    ) -> None:
+        self.layout = layout
+        self.unknown = unknown
+        self.fold_case = fold_case
+        neighbours: Dict[str, Tuple[str, ...]] = dict(layout.value)
+        if fold_case:
+            for letter, replacements in layout.value.items():
+                upper = letter.upper()
+                if upper != letter:
+                    neighbours.setdefault(upper, tuple(r.upper() for r in replacements))
+        table: List[Optional[Tuple[str, ...]]] = [None] * (max(map(ord, neighbours)) + 1)
+        for letter, replacements in neighbours.items():
+            table[ord(letter)] = replacements
+        self.table: Tuple[Optional[Tuple[str, ...]], ...] = tuple(table)
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}({self.layout}, unknown={self.unknown}, "
+            f"fold_case={self.fold_case})"
+        )
+
+    def neighbours(self, letter: str, value: str = "") -> Tuple[str, ...]:
+        """
+        The letters adjacent to `letter`, applying the `unknown` policy if there aren't any.
+        `value` is only used for the error message.
+        """
+        code = ord(letter)
+        if code < len(self.table):
+            replacements = self.table[code]
+            if replacements is not None:
+                return replacements
+        return self._unknown(letter, value)
+
+    def _unknown(self, letter: str, value: str) -> Tuple[str, ...]:
         if letter.isspace():
             raise ValueError(
                 "Encountered whitespace in `value`",
                 "Split your sentence/fragment by whitespace and provide each word "
                 "as `value` individually",
             )
-        if letter not in layout.value:
+        if self.unknown is UnknownCharacters.RAISE:
             raise ValueError(
                 "Unsupported character.",
                 "Please open a ticket providing `value` which failed",
                 value,
             )
-        for replacement_letter in layout.value[letter]:
+        return ()
+
+
+@functools.lru_cache(maxsize=None)
+def _compiled_layout(layout: Proximities) -> CompiledLayout:
+    return CompiledLayout(layout)
+
+
+def proximity_typo(
+    value: str, /, *, layout: Union[Proximities, CompiledLayout]
+) -> Iterator[str]:
+    """Generates variations on `value` where a letter may've been fat-fingered from `g` to `h` etc."""
+    if not isinstance(layout, CompiledLayout):
+        layout = _compiled_layout(layout)
+    table = layout.table
+    size = len(table)
+    seen: Set[str] = set()
+    for position, letter in enumerate(value):
+        code = ord(letter)
+        replacements = table[code] if code < size else None
+        if replacements is None:
+            replacements = layout._unknown(letter, value)
+        before, after = value[:position], value[position + 1 :]
+        for replacement_letter in replacements:
             new_value = f"{before}{replacement_letter}{after}"
             if new_value not in seen:
                 yield new_value
@@ -214,47 +361,1196 @@ def proximity_typo(value: str, /, *, layout: Proximities) -> Iterator[str]:
 
 
 horizontal_proximity_typo = functools.partial(
-    proximity_typo, layout=Proximities.QWERTY_HORIZONTAL
+    proximity_typo, layout=CompiledLayout(Proximities.QWERTY_HORIZONTAL)
 )
 vertical_proximity_typo = functools.partial(
-    proximity_typo, layout=Proximities.QWERTY_VERTICAL
+    proximity_typo, layout=CompiledLayout(Proximities.QWERTY_VERTICAL)
 )
 
 
 def multiple(
     value: str,
     handlers: Sequence[Callable[..., Iterator[str]]],
+    *,
+    limit: Optional[int] = None,
+    until: Optional[Callable[[str], bool]] = None,
 ) -> Iterator[str]:
-    """Generation of variations on `value` across multiple generator types."""
+    """
+    Generation of variations on `value` across multiple generator types.
+    Generation stops, without running the remaining handlers, once `limit` variations have
+    been yielded. If `until` is given, it's the variations for which `until(variation)` is true
+    which count towards `limit` (which defaults to 1), e.g. `until=dictionary.__contains__`
+    stops at the first real word.
+    """
+    if until is not None and limit is None:
+        limit = 1
+    if limit is not None and limit < 1:
+        return
+    found = 0
     seen: Set[str] = set()
     for handler in handlers:
         for typo in handler(value):
             if typo not in seen:
                 yield typo
                 seen.add(typo)
+                if limit is not None and (until is None or until(typo)):
+                    found += 1
+                    if found >= limit:
+                        return
+
+
+def batch(
+    values: Iterable[str],
+    handlers: Sequence[Callable[..., Iterator[str]]],
+) -> Iterator[Tuple[str, str]]:
+    """
+    Generation of variations for many `values` at once, as a flat stream of `(value, variant)`
+    pairs. Each distinct `value` is only expanded the first time it is seen, and the
+    deduplication set is reused across the whole batch rather than being rebuilt per word.
+    The handlers provided here aren't called at all: their edits are made directly, with
+    slicing and layout tables prepared once for the whole batch so that no variation is
+    generated twice.
+    If numpy is installed, and `handlers` are only dropped & swapped letters and proximity
+    typos, large groups of words of the same length are expanded as array operations instead.
+    """
+    handlers = tuple(handlers)
+    if not handlers:
+        # e.g. a `TypoIndex` of just the words, as `load_dictionary` writes.
+        return iter(())
+    operations = _operations(handlers)
+    if operations is None:
+        return _handler_batch(values, handlers)
+    if (
+        all(operation != "casing" for operation, _ in operations)
+        and importlib.util.find_spec("numpy") is not None
+    ):
+        per_value = _vectorised_batch(values, handlers, operations)
+    else:
+        per_value = _expanded_batch(values, handlers, operations)
+    # Chaining each value's pairs together keeps them from passing through a generator.
+    return itertools.chain.from_iterable(per_value)
+
+
+def _handler_batch(
+    values: Iterable[str],
+    handlers: Tuple[Callable[..., Iterator[str]], ...],
+) -> Iterator[Tuple[str, str]]:
+    """`batch`, calling `handlers` for each value, when they aren't all ones provided here."""
+    done: Set[str] = set()
+    seen: Set[str] = set()
+    for value in values:
+        if value in done:
+            continue
+        done.add(value)
+        seen.clear()
+        for handler in handlers:
+            for typo in handler(value):
+                if typo not in seen:
+                    yield value, typo
+                    seen.add(typo)
+
 
+def _expanded_batch(
+    values: Iterable[str],
+    handlers: Tuple[Callable[..., Iterator[str]], ...],
+    operations: Tuple[Tuple[str, Optional[CompiledLayout]], ...],
+) -> Iterator[Iterator[Tuple[str, str]]]:
+    """The pairs for each distinct one of `values`, for `batch`."""
+    expand = _expander(operations)
+    done: Set[str] = set()
+    for value in values:
+        if value not in done:
+            done.add(value)
+            yield _expanded_pairs(value, handlers, expand)
 
-common = functools.partial(
-    multiple,
-    handlers=(
-        dropped_letter,
-        swapped_letter,
-        horizontal_proximity_typo,
-    ),
+
+def _batch_chunk(
+    values: Sequence[str],
+    handlers: Sequence[Callable[..., Iterator[str]]],
+) -> List[Tuple[str, str]]:
+    """Worker side of `parallel`, which has to return something picklable."""
+    return list(batch(values, handlers))
+
+
+def parallel(
+    values: Iterable[str],
+    handlers: Sequence[Callable[..., Iterator[str]]],
+    *,
+    workers: Optional[int] = None,
+    chunksize: int = 1000,
+    ordered: bool = True,
+) -> Iterator[Tuple[str, str]]:
+    """
+    Same output as `batch`, but `values` are sharded into chunks of `chunksize` and expanded
+    across a process pool of `workers` processes.
+    Only a couple of chunks per worker are ever in flight, so results are streamed back without
+    holding the whole vocabulary (or all of its variants) in memory.
+    If `ordered` is false, chunks are yielded as they complete rather than in input order.
+    Words repeated across different chunks are expanded once per chunk.
+    """
+    return _pooled(
+        functools.partial(_batch_chunk, handlers=tuple(handlers)),
+        values,
+        workers=workers,
+        chunksize=chunksize,
+        ordered=ordered,
+    )
+
+
+def _pooled(
+    function: Callable[[Tuple[str, ...]], List[Tuple[str, str]]],
+    values: Iterable[str],
+    *,
+    workers: Optional[int],
+    chunksize: int,
+    ordered: bool,
+    initializer: Optional[Callable[[], None]] = None,
+) -> Iterator[Tuple[str, str]]:
+    """
+    Runs `function` over chunks of `values` in a process pool, keeping a couple of chunks per
+    worker in flight, and yields from each of the results in turn.
+    """
+    from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+    if chunksize < 1:
+        raise ValueError("`chunksize` must be a positive integer", chunksize)
+    workers = workers or os.cpu_count() or 1
+    remaining = iter(values)
+    chunks: Iterator[Tuple[str, ...]] = iter(
+        lambda: tuple(itertools.islice(remaining, chunksize)), ()
+    )
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer) as executor:
+        in_flight = 2 * workers
+        pending: Deque["Future[List[Tuple[str, str]]]"] = collections.deque(
+            executor.submit(function, chunk) for chunk in itertools.islice(chunks, in_flight)
+        )
+        while pending:
+            if ordered:
+                done = pending.popleft()
+            else:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                done = finished.pop()
+                pending.remove(done)
+            for chunk in itertools.islice(chunks, 1):
+                pending.append(executor.submit(function, chunk))
+            yield from done.result()
+
+
+COMMON_HANDLERS: Tuple[Callable[..., Iterator[str]], ...] = (
+    dropped_letter,
+    swapped_letter,
+    horizontal_proximity_typo,
 )
-"""Allows for missing letters, swapped letters, and adjacent horizontal typos."""
+"""The handlers used by `common`"""
 
-mix = functools.partial(
-    multiple,
-    handlers=(
-        dropped_letter,
-        swapped_letter,
-        horizontal_proximity_typo,
-        vertical_proximity_typo,
-    ),
+MIX_HANDLERS: Tuple[Callable[..., Iterator[str]], ...] = (
+    dropped_letter,
+    swapped_letter,
+    horizontal_proximity_typo,
+    vertical_proximity_typo,
 )
+"""The handlers used by `mix`"""
+
+common = functools.partial(multiple, handlers=COMMON_HANDLERS)
+"""Allows for missing letters, swapped letters, and adjacent horizontal typos."""
+
+mix = functools.partial(multiple, handlers=MIX_HANDLERS)
 """Allow for missing letters, swapped letters, and complete horizontal & vertical typos"""
 
+
+def edits(
+    value: str,
+    k: int = 2,
+    handlers: Sequence[Callable[..., Iterator[str]]] = MIX_HANDLERS,
+    *,
+    known: Optional[Container[str]] = None,
+    streaming: bool = False,
+) -> Iterator[str]:
+    """
+    Generation of variations on `value` which are up to `k` typos away, by applying `handlers`
+    to each level's output in turn. Everything from the first level is yielded before the
+    second level, and so on; `value` itself is never yielded.
+    Variations are deduplicated across all the levels, which means remembering every one of
+    them. With `streaming`, the last (and by far the largest) level is instead only
+    deduplicated against the earlier levels, so it may yield some repeats but memory stays
+    proportional to the `k - 1` distance variants.
+    If `known` is given (e.g. a set of dictionary words), only variations in it are yielded,
+    though everything is still used to generate the next level.
+    Variations which a handler raises for (e.g. "Test" from `swapped_casing`, which the
+    layouts don't know) are still yielded, but nothing further is generated from them.
+    """
+    if k < 1:
+        raise ValueError("`k` must be a positive integer", k)
+    handlers = tuple(handlers)
+    seen: Set[str] = {value}
+    frontier: List[str] = [value]
+    for level in range(1, k + 1):
+        last = level == k
+        following: List[str] = []
+        for word in frontier:
+            if level == 1:
+                typos: Iterable[str] = multiple(word, handlers)
+            else:
+                try:
+                    typos = tuple(multiple(word, handlers))
+                except ValueError:
+                    continue
+            for typo in typos:
+                if typo in seen:
+                    continue
+                if not (last and streaming):
+                    seen.add(typo)
+                if not last:
+                    following.append(typo)
+                if known is None or typo in known:
+                    yield typo
+        frontier = following
+
+
+def _operations(
+    handlers: Sequence[Callable[..., Iterator[str]]],
+) -> Optional[Tuple[Tuple[str, Optional[CompiledLayout]], ...]]:
+    """
+    Work out which of the built in edits each of `handlers` performs, so that they can be done
+    without calling the handler. Returns None if any of them isn't one of ours.
+    """
+    operations: List[Tuple[str, Optional[CompiledLayout]]] = []
+    for handler in handlers:
+        if handler is dropped_letter:
+            operations.append(("drop", None))
+        elif handler is swapped_letter:
+            operations.append(("swap", None))
+        elif handler is swapped_casing:
+            operations.append(("casing", None))
+        elif (
+            isinstance(handler, functools.partial)
+            and handler.func is proximity_typo
+            and not handler.args
+            and handler.keywords.keys() == {"layout"}
+        ):
+            layout = handler.keywords["layout"]
+            if not isinstance(layout, CompiledLayout):
+                layout = _compiled_layout(layout)
+            operations.append(("substitute", layout))
+        else:
+            return None
+    return tuple(operations)
+
+
+def _expander(
+    operations: Tuple[Tuple[str, Optional[CompiledLayout]], ...],
+) -> Callable[[str], List[str]]:
+    """
+    A function giving exactly the variations `multiple` would for `operations`, in the same
+    order, for `batch`. Everything which doesn't depend on the word is worked out once here:
+    repeated operations are dropped, and each layout's table loses the replacements an earlier
+    layout already makes, so nothing is generated twice and nothing needs deduplicating.
+    The function raises `ValueError` for anything it can't be sure of, such as the words the
+    handlers would raise for, which should then be left to `multiple`.
+    """
+    steps: List[
+        Tuple[str, Tuple[Optional[Tuple[str, ...]], ...], bool, Optional[Tuple[str, ...]]]
+    ] = []
+    done: Set[str] = set()
+    layouts: List[Tuple[Optional[Tuple[str, ...]], ...]] = []
+    for operation, layout in operations:
+        if layout is None:
+            if operation not in done:
+                done.add(operation)
+                # Casing needs to know what the layouts before it already replace letters with.
+                merged = _merged_tables(layouts) if operation == "casing" else ()
+                steps.append((operation, merged, False, None))
+            continue
+        table = layout.table
+        missing: Optional[Tuple[str, ...]] = None
+        if layout.unknown is UnknownCharacters.SKIP:
+            # Make unknown letters the same as having no replacements.
+            table = tuple(replacements or () for replacements in table)
+            missing = ()
+        earlier = _merged_tables(layouts)
+        steps.append(
+            (
+                operation,
+                tuple(
+                    None
+                    if replacements is None
+                    else tuple(
+                        replacement
+                        for replacement in dict.fromkeys(replacements)
+                        if code >= len(earlier) or replacement not in (earlier[code] or ())
+                    )
+                    for code, replacements in enumerate(table)
+                ),
+                "casing" in done,
+                missing,
+            )
+        )
+        layouts.append(table)
+
+    def expand(value: str) -> List[str]:
+        if _WHITESPACE.search(value):
+            raise ValueError("Encountered whitespace in `value`", value)
+        length = len(value)
+        variants: List[str] = []
+        for operation, table, after_casing, missing in steps:
+            if operation == "drop":
+                variants += [
+                    f"{value[:position]}{value[position + 1 :]}"
+                    for position in range(length)
+                    if not position or value[position] != value[position - 1]
+                ]
+            elif operation == "swap":
+                swaps = [
+                    f"{value[:position]}{value[position + 1]}{value[position]}"
+                    f"{value[position + 2 :]}"
+                    for position in range(length - 1)
+                    if value[position] != value[position + 1]
+                ]
+                doubled = _DOUBLED.search(value)
+                if doubled is not None:
+                    # Every pair before the first doubled letter was a swap, so it goes there.
+                    swaps.insert(doubled.start(), value)
+                variants += swaps
+            elif operation == "casing":
+                size = len(table)
+                for position, letter in enumerate(value):
+                    replacement = _swapped_case(letter)
+                    if len(replacement) != 1:
+                        # e.g. "ß" becomes "SS", which could coincide with an edit elsewhere.
+                        raise ValueError("Casing changes the length of `value`", value)
+                    code = ord(letter)
+                    if code >= size or replacement not in (table[code] or ()):
+                        variants.append(f"{value[:position]}{replacement}{value[position + 1 :]}")
+            else:
+                size = len(table)
+                for position, letter in enumerate(value):
+                    code = ord(letter)
+                    replacements = table[code] if code < size else missing
+                    if replacements is None:
+                        raise ValueError("Unsupported character.", value)
+                    if after_casing:
+                        replacements = tuple(
+                            replacement
+                            for replacement in replacements
+                            if replacement != _swapped_case(letter)
+                        )
+                    if replacements:
+                        before, after = value[:position], value[position + 1 :]
+                        variants += [
+                            f"{before}{replacement}{after}" for replacement in replacements
+                        ]
+        return variants
+
+    return expand
+
+
+def _merged_tables(
+    tables: List[Tuple[Optional[Tuple[str, ...]], ...]],
+) -> Tuple[Optional[Tuple[str, ...]], ...]:
+    """The replacements of each of the layout `tables` put together, for `_expander`."""
+    if not tables:
+        return ()
+    merged: List[Optional[Tuple[str, ...]]] = [None] * max(len(table) for table in tables)
+    for table in tables:
+        for code, replacements in enumerate(table):
+            if replacements:
+                merged[code] = (merged[code] or ()) + replacements
+    return tuple(merged)
+
+
+def _expanded_pairs(
+    value: str,
+    handlers: Tuple[Callable[..., Iterator[str]], ...],
+    expand: Callable[[str], List[str]],
+) -> Iterator[Tuple[str, str]]:
+    """
+    The `(value, variant)` pairs for `batch`, made by `expand` where possible. Anything it
+    can't do is left to `multiple`, so errors are raised at exactly the same point.
+    """
+    try:
+        variants: Iterable[str] = expand(value)
+    except ValueError:
+        variants = multiple(value, handlers)
+    return zip(itertools.repeat(value), variants)
+
+
+class _TrieNode:
+    __slots__ = ("children", "terminal")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, _TrieNode] = {}
+        self.terminal = False
+
+    def follow(self, value: str, start: int = 0) -> Optional["_TrieNode"]:
+        """The node reached by walking `value[start:]` from here, if there is one."""
+        node = self
+        for position in range(start, len(value)):
+            child = node.children.get(value[position])
+            if child is None:
+                return None
+            node = child
+        return node
+
+
+class Trie:
+    """
+    A prefix tree of words, for use with `known_variants`, which can then stop building
+    variations as soon as their prefix can't be a word.
+    """
+
+    __slots__ = ("_root", "_size")
+
+    def __init__(self, words: Iterable[str] = ()) -> None:
+        self._root = _TrieNode()
+        self._size = 0
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str) -> None:
+        node = self._root
+        for char in word:
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = _TrieNode()
+            node = child
+        if not node.terminal:
+            node.terminal = True
+            self._size += 1
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, word: object) -> bool:
+        if not isinstance(word, str):
+            return False
+        node = self._root.follow(word)
+        return node is not None and node.terminal
+
+
+def _walk_variants(
+    value: str,
+    trie: Trie,
+    operations: Tuple[Tuple[str, Optional[CompiledLayout]], ...],
+) -> Iterator[str]:
+    """
+    The variations on `value` which are in `trie`, found by walking the trie alongside each
+    edit, so strings are only built for the variations which exist.
+    """
+    for position, char in enumerate(value):
+        if char.isspace():
+            raise ValueError(
+                f"Encountered whitespace in `value` at position {position}",
+                "Split your sentence/fragment by whitespace and provide each word "
+                "as `value` individually",
+            )
+    # prefixes[n] is the node for value[:n]; once a prefix isn't in the trie, no later one is.
+    prefixes: List[_TrieNode] = [trie._root]
+    for char in value:
+        child = prefixes[-1].children.get(char)
+        if child is None:
+            break
+        prefixes.append(child)
+    length = len(value)
+    seen: Set[str] = set()
+    for operation, layout in operations:
+        for position in range(length):
+            node = prefixes[position] if position < len(prefixes) else None
+            if operation == "drop":
+                if node is None:
+                    break
+                found = node.follow(value, position + 1)
+                if found is not None and found.terminal:
+                    new_value = f"{value[:position]}{value[position + 1 :]}"
+                    if new_value not in seen:
+                        yield new_value
+                        seen.add(new_value)
+            elif operation == "swap":
+                if node is None or position + 1 >= length:
+                    break
+                thischar, nextchar = value[position], value[position + 1]
+                found = node.follow(f"{nextchar}{thischar}")
+                if found is not None:
+                    found = found.follow(value, position + 2)
+                if found is not None and found.terminal:
+                    new_value = f"{value[:position]}{nextchar}{thischar}{value[position + 2 :]}"
+                    if new_value not in seen:
+                        yield new_value
+                        seen.add(new_value)
+            else:
+                # Unlike the other two, these have to look at every letter, because they may
+                # raise for ones they don't support.
+                letter = value[position]
+                if layout is None:
+                    replacements: Tuple[str, ...] = (_swapped_case(letter),)
+                else:
+                    replacements = layout.neighbours(letter, value)
+                if node is None:
+                    continue
+                for replacement in replacements:
+                    found = node.children.get(replacement)
+                    if found is not None:
+                        found = found.follow(value, position + 1)
+                    if found is not None and found.terminal:
+                        new_value = f"{value[:position]}{replacement}{value[position + 1 :]}"
+                        if new_value not in seen:
+                            yield new_value
+                            seen.add(new_value)
+
+
+_ASCII_WHITESPACE = b" \t\n\r\x0b\x0c"
+
+
+def multiple_bytes(
+    value: Union[str, bytes],
+    handlers: Sequence[Callable[..., Iterator[str]]] = MIX_HANDLERS,
+) -> Iterator[bytes]:
+    """
+    Generation of variations on the ASCII `value` across multiple generator types, the same as
+    `multiple` but as `bytes`, for things which would only encode them again to hash or store
+    them. The built in handlers are done with `bytes` slicing and a reused `bytearray`, so no
+    `str` is ever built; anything else is run as normal and its output encoded.
+    """
+    if isinstance(value, str):
+        if not value.isascii():
+            raise ValueError("`value` must be ASCII", value)
+        encoded = value.encode("ascii")
+    elif value.isascii():
+        encoded = value
+    else:
+        raise ValueError("`value` must be ASCII", value)
+    operations = _operations(handlers)
+    if operations is None:
+        text = encoded.decode("ascii")
+        for typo in multiple(text, handlers):
+            yield typo.encode("ascii")
+        return
+    if len(encoded.translate(None, _ASCII_WHITESPACE)) != len(encoded):
+        raise ValueError(
+            "Encountered whitespace in `value`",
+            "Split your sentence/fragment by whitespace and provide each word "
+            "as `value` individually",
+        )
+    length = len(encoded)
+    buffer = bytearray(encoded)
+    seen: Set[bytes] = set()
+    for operation, layout in operations:
+        if operation == "drop":
+            candidates: Iterator[bytes] = (
+                encoded[:position] + encoded[position + 1 :] for position in range(length)
+            )
+        elif operation == "swap":
+            candidates = _swapped_bytes(buffer)
+        elif operation == "casing":
+            candidates = _swapped_casing_bytes(buffer)
+        else:
+            assert layout is not None
+            candidates = _proximity_bytes(buffer, layout)
+        for variant in candidates:
+            if variant not in seen:
+                yield variant
+                seen.add(variant)
+
+
+def _swapped_bytes(buffer: bytearray) -> Iterator[bytes]:
+    for position in range(len(buffer) - 1):
+        thischar, nextchar = buffer[position], buffer[position + 1]
+        buffer[position], buffer[position + 1] = nextchar, thischar
+        yield bytes(buffer)
+        buffer[position], buffer[position + 1] = thischar, nextchar
+
+
+def _swapped_casing_bytes(buffer: bytearray) -> Iterator[bytes]:
+    for position, char in enumerate(buffer):
+        replacement = _swapped_case(chr(char))
+        buffer[position] = ord(replacement)
+        yield bytes(buffer)
+        buffer[position] = char
+
+
+def _proximity_bytes(buffer: bytearray, layout: CompiledLayout) -> Iterator[bytes]:
+    table = layout.table
+    size = len(table)
+    for position, char in enumerate(buffer):
+        replacements = table[char] if char < size else None
+        if replacements is None:
+            replacements = layout._unknown(chr(char), buffer.decode("ascii"))
+        for replacement in replacements:
+            buffer[position] = ord(replacement)
+            yield bytes(buffer)
+        buffer[position] = char
+
+
+_VECTORISED_CHUNK = 8192
+"""The most values `batch` reads at a time when it might use numpy."""
+_VECTORISED_MIN_GROUP = 64
+"""How many of those values need to be the same length before numpy is used for them."""
+_VECTORISED_MAX_LENGTH = 10
+"""The longest values numpy is used for; beyond this the plain Python edits are quicker."""
+_VECTORISED_BUDGET = 4_000_000
+"""
+Roughly how many code points the arrays for one chunk may hold, as `length * length * width`
+for each value, where `width` is how many variations each position can make. The numpy path
+holds every variation of a chunk at once, so this is what bounds its memory.
+"""
+_WHITESPACE = re.compile(r"\s")
+_DOUBLED = re.compile(r"(.)\1", re.DOTALL)
+
+
+def _vectorised_batch(
+    values: Iterable[str],
+    handlers: Tuple[Callable[..., Iterator[str]], ...],
+    operations: Tuple[Tuple[str, Optional[CompiledLayout]], ...],
+) -> Iterator[Iterator[Tuple[str, str]]]:
+    """
+    The pairs for each distinct one of `values`, for `batch`, but reading `values` in chunks
+    and expanding sufficiently large groups of short words of the same length with numpy.
+    Chunks end early once their arrays would exceed `_VECTORISED_BUDGET`, so memory stays
+    bounded whatever the words' lengths. Anything else, including words which would make a
+    handler raise, is left to `_expanded_pairs`, so the output is exactly the same either way.
+    """
+    numpy: Optional[ModuleType] = None
+    expand = _expander(operations)
+    width = sum(
+        1 if layout is None else max(len(replacements or ()) for replacements in layout.table)
+        for _, layout in operations
+    )
+    done: Set[str] = set()
+    remaining = iter(values)
+    while True:
+        chunk: List[str] = []
+        read = cost = 0
+        for value in remaining:
+            read += 1
+            if value in done:
+                continue
+            done.add(value)
+            chunk.append(value)
+            if len(value) <= _VECTORISED_MAX_LENGTH:
+                cost += len(value) * len(value) * width
+            if len(chunk) >= _VECTORISED_CHUNK or cost >= _VECTORISED_BUDGET:
+                break
+        if not read:
+            break
+        by_length: Dict[int, List[int]] = {}
+        for position, value in enumerate(chunk):
+            if 1 < len(value) <= _VECTORISED_MAX_LENGTH and not _WHITESPACE.search(value):
+                by_length.setdefault(len(value), []).append(position)
+        expanded: Dict[int, Tuple[str, ...]] = {}
+        for length, positions in by_length.items():
+            if len(positions) < _VECTORISED_MIN_GROUP:
+                continue
+            if numpy is None:
+                numpy = importlib.import_module("numpy")
+            words = [chunk[position] for position in positions]
+            variants = _vectorised_variants(numpy, words, length, operations)
+            expanded.update(
+                (position, found)
+                for position, found in zip(positions, variants)
+                if found is not None
+            )
+        for position, value in enumerate(chunk):
+            if position in expanded:
+                yield zip(itertools.repeat(value), expanded[position])
+            else:
+                yield _expanded_pairs(value, handlers, expand)
+
+
+def _vectorised_variants(
+    numpy: ModuleType,
+    words: List[str],
+    length: int,
+    operations: Tuple[Tuple[str, Optional[CompiledLayout]], ...],
+) -> List[Optional[Tuple[str, ...]]]:
+    """
+    The deduplicated variations for each of `words`, all of which are `length` long, in the
+    same order `multiple` would give them. Each word is a row of UCS4 code points, and every
+    edit is an index permutation (or substitution) applied to all the rows at once.
+    Words which a handler would raise for are given as None.
+    """
+    count = len(words)
+    codes = numpy.frombuffer("".join(words).encode("utf-32-le"), dtype="<u4")
+    codes = codes.reshape(count, length)
+    usable = numpy.ones(count, dtype=bool)
+    found: List[List[str]] = [[] for _ in range(count)]
+
+    def decode(rows: Any, per_word: List[int]) -> None:
+        width = rows.shape[-1]
+        text = rows.astype("<u4").tobytes().decode("utf-32-le")
+        if width:
+            strings = [text[offset : offset + width] for offset in range(0, len(text), width)]
+        else:
+            strings = [""] * len(rows)
+        start = 0
+        for word, number in enumerate(per_word):
+            found[word] += strings[start : start + number]
+            start += number
+
+    for operation, layout in operations:
+        if operation == "drop":
+            keep = numpy.array(
+                [
+                    [other for other in range(length) if other != position]
+                    for position in range(length)
+                ]
+            )
+            decode(codes[:, keep].reshape(-1, length - 1), [length] * count)
+        elif operation == "swap":
+            swaps = numpy.tile(numpy.arange(length), (length - 1, 1))
+            for position in range(length - 1):
+                swaps[position, position], swaps[position, position + 1] = position + 1, position
+            decode(codes[:, swaps].reshape(-1, length), [length - 1] * count)
+        elif layout is not None:
+            width = max(len(replacements or ()) for replacements in layout.table)
+            # The last row is for code points beyond the end of the layout's table.
+            table = numpy.zeros((len(layout.table) + 1, width), dtype="<u4")
+            known = numpy.zeros(len(layout.table) + 1, dtype=bool)
+            for code, replacements in enumerate(layout.table):
+                if replacements is not None:
+                    known[code] = True
+                    table[code, : len(replacements)] = [ord(r) for r in replacements]
+            clipped = numpy.minimum(codes, len(layout.table))
+            if layout.unknown is UnknownCharacters.RAISE:
+                usable &= known[clipped].all(axis=1)
+            neighbours = table[clipped]
+            rows = numpy.repeat(codes[:, None, None, :], length, axis=1)
+            rows = numpy.repeat(rows, width, axis=2)
+            positions = numpy.arange(length)
+            rows[:, positions, :, positions] = neighbours.transpose(1, 0, 2)
+            valid = neighbours != 0
+            decode(rows[valid], valid.reshape(count, -1).sum(axis=1).tolist())
+    return [
+        tuple(dict.fromkeys(variants)) if ok else None
+        for variants, ok in zip(found, usable.tolist())
+    ]
+
+
+def _one_away(
+    a: str,
+    b: str,
+    operations: Tuple[Tuple[str, Optional[CompiledLayout]], ...],
+) -> bool:
+    length = len(a)
+    difference = length - len(b)
+    if difference not in (0, 1):
+        return False
+    shortest = len(b)
+    prefix = 0
+    while prefix < shortest and a[prefix] == b[prefix]:
+        prefix += 1
+    if difference == 0 and prefix == length:
+        # Only swapping a doubled letter gives back the same string.
+        return any(operation == "swap" for operation, _ in operations) and any(
+            a[position] == a[position + 1] for position in range(length - 1)
+        )
+    suffix = 0
+    while suffix < shortest - prefix and a[length - 1 - suffix] == b[shortest - 1 - suffix]:
+        suffix += 1
+    for operation, layout in operations:
+        if operation == "drop":
+            if difference == 1 and prefix + suffix >= shortest:
+                return True
+        elif difference == 1:
+            continue
+        elif operation == "swap":
+            if (
+                prefix + suffix == length - 2
+                and a[prefix] == b[prefix + 1]
+                and a[prefix + 1] == b[prefix]
+            ):
+                return True
+        elif prefix + suffix == length - 1:
+            letter, replacement = a[prefix], b[prefix]
+            if layout is None:
+                if (letter.islower() or letter.isupper()) and letter.swapcase() == replacement:
+                    return True
+            else:
+                code = ord(letter)
+                if code < len(layout.table) and replacement in (layout.table[code] or ()):
+                    return True
+    return False
+
+
+def is_one_away(
+    a: str,
+    b: str,
+    handlers: Sequence[Callable[..., Iterator[str]]] = MIX_HANDLERS,
+) -> bool:
+    """
+    Whether `b` is one of the variations `handlers` would generate for `a`, i.e.
+    `b in set(multiple(a, handlers))`, decided by comparing them once from each end rather than
+    generating anything. Characters a handler would raise for just can't be typo'd.
+    Handlers other than the ones provided here do have to be run.
+    """
+    operations = _operations(handlers)
+    if operations is None:
+        return any(b == typo for typo in multiple(a, handlers))
+    return _one_away(a, b, operations)
+
+
+def is_one_away_many(
+    a: str,
+    candidates: Iterable[str],
+    handlers: Sequence[Callable[..., Iterator[str]]] = MIX_HANDLERS,
+) -> List[bool]:
+    """`is_one_away(a, candidate, handlers)` for each of `candidates`."""
+    operations = _operations(handlers)
+    if operations is None:
+        variations = set(multiple(a, handlers))
+        return [candidate in variations for candidate in candidates]
+    length = len(a)
+    return [
+        length - len(candidate) in (0, 1) and _one_away(a, candidate, operations)
+        for candidate in candidates
+    ]
+
+
+_REPLACEMENT_COUNTS: Dict[
+    Tuple[Tuple[Tuple[Proximities, UnknownCharacters, bool], ...], bool], Dict[str, int]
+] = {}
+"""
+How many ways each letter can be replaced, for each combination of layouts & casing which
+`count_variants` has seen, filled in by it as letters are first seen. Layouts are keyed by
+what they are rather than by `CompiledLayout` instance, so there's only ever a handful.
+"""
+
+
+def _count_replacements(
+    letter: str,
+    value: str,
+    position: int,
+    layouts: Tuple[CompiledLayout, ...],
+    casing: bool,
+) -> int:
+    """
+    The number of distinct letters `letter` can be replaced with, across `layouts` & casing,
+    or -1 if the casing of it isn't a single letter.
+    """
+    replaced: Set[str] = set()
+    for layout in layouts:
+        replaced.update(layout.neighbours(letter, value))
+    if casing:
+        if letter.isspace():
+            raise ValueError(
+                f"Encountered whitespace in `value` at position {position}",
+                "Split your sentence/fragment by whitespace and provide each word "
+                "as `value` individually",
+            )
+        replacement = _swapped_case(letter)
+        if len(replacement) != 1:
+            # e.g. "ß" becomes "SS", which could coincide with an edit elsewhere.
+            return -1
+        replaced.add(replacement)
+    return len(replaced)
+
+
+def count_variants(
+    value: str,
+    handlers: Sequence[Callable[..., Iterator[str]]] = MIX_HANDLERS,
+) -> int:
+    """
+    How many variations `multiple(value, handlers)` would generate, without generating them.
+    Dropping any letter of a run of repeated letters gives the same variation, so drops count
+    once per run; swapping two different letters always gives a new variation, and swapping
+    any doubled letter gives back `value` itself, once. Every other edit changes exactly one
+    letter, so those only overlap at the same position, and count the distinct replacements
+    (neighbours on each layout & the other casing) at each position.
+    Raises `ValueError` for the same `value` as generating all the variations would.
+    """
+    operations = _operations(handlers)
+    if operations is None:
+        return sum(1 for _ in multiple(value, handlers))
+    length = len(value)
+    drops = swaps = casing = False
+    layouts: Dict[Tuple[Proximities, UnknownCharacters, bool], CompiledLayout] = {}
+    for operation, layout in operations:
+        if operation == "drop" or operation == "swap":
+            if (operation == "drop" or length > 1) and _WHITESPACE.search(value):
+                raise ValueError(
+                    "Encountered whitespace in `value`",
+                    "Split your sentence/fragment by whitespace and provide each word "
+                    "as `value` individually",
+                )
+            drops = drops or operation == "drop"
+            swaps = swaps or operation == "swap"
+        elif layout is None:
+            casing = True
+        else:
+            layouts.setdefault((layout.layout, layout.unknown, layout.fold_case), layout)
+    count = 0
+    if layouts or casing:
+        selected = tuple(layouts.values())
+        counts = _REPLACEMENT_COUNTS.setdefault((tuple(layouts), casing), {})
+        for position, letter in enumerate(value):
+            replacements = counts.get(letter)
+            if replacements is None:
+                replacements = _count_replacements(letter, value, position, selected, casing)
+                counts[letter] = replacements
+            if replacements < 0:
+                return sum(1 for _ in multiple(value, handlers))
+            count += replacements
+    if (drops or swaps) and length:
+        # Each letter which differs from the next one ends a run.
+        different = sum(map(str.__ne__, value, value[1:]))
+        if drops:
+            count += different + 1
+        if swaps:
+            count += different + (different < length - 1)
+    return count
+
+
+def fanout_histogram(
+    words: Iterable[str],
+    handlers: Sequence[Callable[..., Iterator[str]]] = MIX_HANDLERS,
+) -> Dict[int, int]:
+    """
+    How many of `words` have each number of variations under `handlers`, fewest first, e.g.
+    for estimating the size of a `TypoIndex` before building one.
+    """
+    return dict(
+        sorted(collections.Counter(count_variants(word, handlers) for word in words).items())
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _reverse_neighbours(layout: Proximities, fold_case: bool) -> Mapping[str, Tuple[str, ...]]:
+    """
+    For each letter, the letters which have it as a neighbour on `layout`. This is cached by
+    what the layout is rather than by `CompiledLayout` instance, of which there may be many.
+    """
+    reverse: Dict[str, List[str]] = {}
+    for code, replacements in enumerate(CompiledLayout(layout, fold_case=fold_case).table):
+        for replacement in replacements or ():
+            reverse.setdefault(replacement, []).append(chr(code))
+    return MappingProxyType({letter: tuple(letters) for letter, letters in reverse.items()})
+
+
+def one_away_matches(
+    typo: str,
+    words: Trie,
+    handlers: Sequence[Callable[..., Iterator[str]]] = MIX_HANDLERS,
+) -> Iterator[str]:
+    """
+    The words in `words` which `typo` is one away from (by `is_one_away(word, typo)`), found by
+    walking the trie as a distance-1 automaton of `typo` under `handlers` would: along `typo`
+    itself, branching off at each position for the one edit and then following the rest of
+    `typo` exactly. No candidate strings are generated on either side, and only the branches
+    of the trie which could still match are visited.
+    Only the handlers provided here can be compiled like that, anything else raises a
+    `ValueError`.
+    """
+    operations = _operations(handlers)
+    if operations is None:
+        raise ValueError(
+            "Only the handlers provided by oneaway can be used here",
+            handlers,
+        )
+    length = len(typo)
+    seen: Set[str] = set()
+    node: Optional[_TrieNode] = words._root
+    for position in range(length + 1):
+        if node is None:
+            break
+        expected = typo[position] if position < length else ""
+        for operation, layout in operations:
+            # Each of these is a letter, or pair of letters, of the word which the typo got
+            # wrong, and where to carry on matching `typo` exactly from afterwards.
+            if operation == "drop":
+                branches: Iterable[Tuple[str, int]] = (
+                    (char, position) for char in node.children
+                )
+            elif not expected:
+                continue
+            elif operation == "swap":
+                if position + 1 >= length:
+                    continue
+                branches = ((f"{typo[position + 1]}{expected}", position + 2),)
+            elif operation == "casing":
+                char = expected.swapcase()
+                if char.swapcase() != expected or not (char.islower() or char.isupper()):
+                    continue
+                branches = ((char, position + 1),)
+            else:
+                assert layout is not None
+                reverse = _reverse_neighbours(layout.layout, layout.fold_case)
+                branches = ((char, position + 1) for char in reverse.get(expected, ()))
+            for chars, resume in branches:
+                found = node.follow(chars)
+                if found is not None:
+                    found = found.follow(typo, resume)
+                if found is not None and found.terminal:
+                    word = f"{typo[:position]}{chars}{typo[resume:]}"
+                    if word not in seen:
+                        yield word
+                        seen.add(word)
+        node = node.children.get(expected) if expected else None
+
+
+def known_variants(
+    value: str,
+    words: Container[str],
+    handlers: Sequence[Callable[..., Iterator[str]]] = MIX_HANDLERS,
+    *,
+    known: bool = True,
+) -> Iterator[str]:
+    """
+    Generation of variations on `value` which are in `words` (or, if `known` is false, which
+    aren't), in the same order as `multiple`.
+    If `words` is a `Trie` and `handlers` are only the ones provided here, the trie is walked
+    alongside each edit, so variations which can't possibly be words are never built.
+    Otherwise every variation is generated and checked against `words`.
+    """
+    operations = _operations(handlers)
+    if known and operations is not None and isinstance(words, Trie):
+        yield from _walk_variants(value, words, operations)
+        return
+    for typo in multiple(value, handlers):
+        if (typo in words) is known:
+            yield typo
+
+
+def _node_pattern(node: _TrieNode) -> str:
+    """The regular expression matching every word below `node`, sharing common prefixes."""
+    branches: List[str] = []
+    letters: List[str] = []
+    for char, child in sorted(node.children.items()):
+        if child.children:
+            branches.append(f"{re.escape(char)}{_node_pattern(child)}")
+        else:
+            letters.append(re.escape(char))
+    if len(letters) == 1:
+        branches.append(letters[0])
+    elif letters:
+        branches.append(f"[{''.join(letters)}]")
+    if len(branches) == 1 and (not node.terminal or len(branches[0]) == 1 or letters):
+        # A single letter, or a character class, can take a `?` without being grouped.
+        pattern = branches[0]
+    else:
+        pattern = f"(?:{'|'.join(branches)})"
+    if node.terminal:
+        pattern = f"{pattern}?"
+    return pattern
+
+
+def variants_pattern(variants: Iterable[str]) -> str:
+    """
+    A regular expression which matches any of `variants`, factored into a prefix tree, so that
+    e.g. `rest`, `teat` and `tedt` become `(?:rest|te(?:at|dt))`. This is much smaller, and
+    quicker to compile & match, than joining them all with `|`.
+    Empty strings are ignored.
+    """
+    trie = Trie(variant for variant in variants if variant)
+    if not trie:
+        return ""
+    pattern = _node_pattern(trie._root)
+    if pattern.startswith("(?:") and pattern.endswith(")"):
+        return pattern
+    return f"(?:{pattern})"
+
+
+@functools.lru_cache(maxsize=1024)
+def compiled_pattern(
+    value: str,
+    handlers: Tuple[Callable[..., Iterator[str]], ...] = COMMON_HANDLERS,
+) -> "re.Pattern[str]":
+    """
+    The compiled `variants_pattern` for the variations on `value` from `handlers`, remembered
+    for the 1024 most recently used combinations. `.pattern` gives its (uncompiled) size.
+    """
+    return re.compile(variants_pattern(multiple(value, handlers)))
+
+
+DEFAULT_COSTS: Mapping[Callable[..., Iterator[str]], float] = MappingProxyType(
+    {
+        horizontal_proximity_typo: 1.0,
+        swapped_letter: 1.5,
+        dropped_letter: 2.0,
+        vertical_proximity_typo: 2.5,
+        swapped_casing: 4.0,
+    }
+)
+"""How unlikely each kind of typo is, for `ranked`. Lower is more likely."""
+
+
+def _costed(cost: float, order: int, typos: Iterator[str]) -> Iterator[Tuple[float, int, str]]:
+    for typo in typos:
+        yield cost, order, typo
+
+
+def ranked(
+    value: str,
+    costs: Mapping[Callable[..., Iterator[str]], float] = DEFAULT_COSTS,
+) -> Iterator[Tuple[float, str]]:
+    """
+    Generation of `(cost, variation)` pairs on `value`, cheapest first, where each handler in
+    `costs` gives its variations that cost. For probabilities rather than costs, use
+    `-math.log(probability)`.
+    The handlers are merged through a heap, so each is only run as far as is needed; taking
+    the first few results doesn't generate everything. Where handlers give the same variation,
+    it's yielded once, at the cheapest cost.
+    """
+    typos = [
+        _costed(cost, order, handler(value))
+        for order, (handler, cost) in enumerate(costs.items())
+    ]
+    seen: Set[str] = set()
+    for cost, _, typo in heapq.merge(*typos):
+        if typo not in seen:
+            yield cost, typo
+            seen.add(typo)
+
+
+def order_by_hit_rate(
+    handlers: Sequence[Callable[..., Iterator[str]]],
+    words: Container[str],
+    sample: Iterable[str],
+) -> Tuple[Callable[..., Iterator[str]], ...]:
+    """
+    Sorts `handlers` so that those whose variations on `sample` (e.g. some recent queries) are
+    most often in `words` come first, which makes `multiple(..., until=...)` stop sooner on
+    average. Values in `sample` which a handler can't handle are skipped for that handler.
+    """
+    handlers = tuple(handlers)
+    sample = tuple(sample)
+    rates: Dict[int, float] = {}
+    for position, handler in enumerate(handlers):
+        hits = total = 0
+        for value in sample:
+            try:
+                typos = set(handler(value))
+            except ValueError:
+                continue
+            total += len(typos)
+            hits += sum(1 for typo in typos if typo in words)
+        rates[position] = hits / total if total else 0.0
+    return tuple(
+        handlers[position] for position in sorted(rates, key=lambda p: rates[p], reverse=True)
+    )
+
+
+def cached(
+    handlers: Sequence[Callable[..., Iterator[str]]],
+    *,
+    maxsize: Optional[int] = 4096,
+) -> "functools._lru_cache_wrapper[Tuple[str, ...]]":
+    """
+    Returns a function which gives the same variations as `multiple` with `handlers`, as a tuple,
+    but remembers the results for the `maxsize` most recently used values.
+    Hits & misses are available from its `cache_info()`, and it can be emptied with
+    `cache_clear()`::
+    >>> import oneaway
+    >>> cached_common = oneaway.cached(oneaway.COMMON_HANDLERS, maxsize=5000)
+    >>> cached_common("test")
+    >>> cached_common.cache_info()
+    """
+    handlers = tuple(handlers)
+
+    @functools.lru_cache(maxsize=maxsize)
+    def variations(value: str) -> Tuple[str, ...]:
+        return tuple(multiple(value, handlers))
+
+    return variations
+
+
 aggregate = mix
 """Alternative export name for `mix`"""
 
@@ -265,28 +1561,708 @@ solution = mix
 """Alternative export name for `mix`"""
 
 
+def _compact(building: Dict[str, List[int]]) -> Dict[str, Union[int, Tuple[int, ...]]]:
+    """Store each list of word positions as either a bare integer or a tuple, to save memory."""
+    return {key: found[0] if len(found) == 1 else tuple(found) for key, found in building.items()}
+
+
+def _positions(index: Dict[str, Union[int, Tuple[int, ...]]], key: str) -> Tuple[int, ...]:
+    found = index.get(key, ())
+    if isinstance(found, int):
+        return (found,)
+    return found
+
+
+def _memory_usage(
+    words: Tuple[str, ...], index: Dict[str, Union[int, Tuple[int, ...]]]
+) -> int:
+    total = sys.getsizeof(index) + sys.getsizeof(words)
+    total += sum(sys.getsizeof(word) for word in words)
+    shared = {id(word) for word in words}
+    for key, found in index.items():
+        if id(key) not in shared:
+            total += sys.getsizeof(key)
+        if isinstance(found, tuple):
+            total += sys.getsizeof(found)
+    return total
+
+
+def _handled(
+    words: Iterable[str],
+    handlers: Sequence[Callable[..., Iterator[str]]],
+) -> Tuple[Tuple[str, ...], int]:
+    """
+    The distinct `words` which `handlers` can generate variations for, in order, and how many
+    which they can't there were.
+    """
+    handled: List[str] = []
+    skipped = 0
+    for word in dict.fromkeys(words):
+        try:
+            # This raises for exactly the words generating variations would, but much quicker.
+            count_variants(word, handlers)
+        except ValueError:
+            skipped += 1
+        else:
+            handled.append(word)
+    return tuple(handled), skipped
+
+
+class TypoIndex:
+    """
+    A reverse index from each variant (typo) back to the word(s) it could be a typo of, built
+    by expanding every word with `handlers`.
+    Each word is also indexed as itself, so looking up a correctly spelled word finds it.
+    Words are stored once, and each variant maps to either a single integer position in
+    `words` or a tuple of them, to keep the (very many) entries small.
+    Words which `handlers` can't generate variations for (such as "don't", whose apostrophe
+    isn't on any keyboard layout) are left out of the index entirely, and counted in `skipped`.
+    """
+
+    __slots__ = ("words", "skipped", "_index")
+
+    def __init__(
+        self,
+        words: Iterable[str],
+        handlers: Sequence[Callable[..., Iterator[str]]] = MIX_HANDLERS,
+    ) -> None:
+        self.words, self.skipped = _handled(words, handlers)
+        positions = {word: position for position, word in enumerate(self.words)}
+        building: Dict[str, List[int]] = {word: [position] for word, position in positions.items()}
+        for word, typo in batch(self.words, handlers):
+            found = building.setdefault(typo, [])
+            position = positions[word]
+            if position not in found:
+                found.append(position)
+        self._index = _compact(building)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, typo: object) -> bool:
+        return typo in self._index
+
+    def lookup(self, typo: str) -> Tuple[str, ...]:
+        """The words which `typo` could have been intended to be, if any."""
+        return tuple(self.words[position] for position in _positions(self._index, typo))
+
+    def memory_usage(self) -> int:
+        """
+        Approximate number of bytes held by the index, its keys & values, and the words.
+        Small integers are shared by the interpreter, so aren't counted.
+        """
+        return _memory_usage(self.words, self._index)
+
+    def save(self, path: str) -> None:
+        """
+        Write the index to `path` in a format which `MappedTypoIndex` can open without reading
+        it all into memory; see that for the layout.
+        """
+        words = [word.encode("utf-8") for word in self.words]
+        keys = sorted((key.encode("utf-8"), key) for key in self._index)
+        offsets = array.array("I", [0])
+        for word in words:
+            offsets.append(offsets[-1] + len(word))
+        for encoded, _ in keys:
+            offsets.append(offsets[-1] + len(encoded))
+        postings_offsets = array.array("I", [0])
+        postings = array.array("I")
+        for _, key in keys:
+            postings.extend(_positions(self._index, key))
+            postings_offsets.append(len(postings))
+        header = array.array("I", [_MAPPED_BYTE_ORDER, len(words), len(keys), len(postings)])
+        with open(path, "wb") as f:
+            f.write(_MAPPED_MAGIC)
+            f.write(header.tobytes())
+            f.write(offsets.tobytes())
+            f.write(postings_offsets.tobytes())
+            f.write(postings.tobytes())
+            for word in words:
+                f.write(word)
+            for encoded, _ in keys:
+                f.write(encoded)
+
+
+_MAPPED_MAGIC = b"ONEAWAY\x01"
+_MAPPED_BYTE_ORDER = 0x01020304
+
+
+class MappedTypoIndex:
+    """
+    Read-only access to a `TypoIndex` which was written with `TypoIndex.save`, via `mmap`.
+    Nothing is deserialized up front, so opening is instant and every process which opens the
+    same file shares the same pages of memory.
+
+    The file is a magic number and a header of 4 unsigned 32bit integers (a byte order check,
+    the number of words, the number of keys, and the number of postings), then:
+     - the offsets of each word and then of each (sorted) key within the string data,
+     - the offsets of each key's positions within the postings,
+     - the postings, being positions of words,
+     - the string data, all the UTF-8 encoded words followed by all the keys.
+    Lookups are a binary search over the sorted keys.
+    """
+
+    __slots__ = (
+        "_file",
+        "_mmap",
+        "_view",
+        "_ints",
+        "_words",
+        "_keys",
+        "_postings_offsets",
+        "_postings",
+        "_strings",
+    )
+
+    def __init__(self, path: str) -> None:
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self._view = memoryview(self._mmap)
+        start = len(_MAPPED_MAGIC)
+        if self._view[:start] != _MAPPED_MAGIC:
+            self.close()
+            raise ValueError("Not a file written by `TypoIndex.save`", path)
+        if len(self._view) < start + 16:
+            self.close()
+            raise ValueError("The file is truncated", path)
+        header = self._view[start : start + 16].cast("I")
+        byte_order, self._words, self._keys, postings = header
+        header.release()
+        if byte_order != _MAPPED_BYTE_ORDER:
+            self.close()
+            raise ValueError(
+                "The file was written on a machine with a different byte order", path
+            )
+        start += 16
+        self._postings_offsets = self._words + self._keys + 1
+        self._postings = self._postings_offsets + self._keys + 1
+        self._strings = start + 4 * (self._postings + postings)
+        if len(self._view) < self._strings:
+            self.close()
+            raise ValueError("The file is truncated", path)
+        self._ints = self._view[start : self._strings].cast("I")
+        # The last string offset is where the last key ends.
+        if len(self._view) < self._strings + self._ints[self._words + self._keys]:
+            self.close()
+            raise ValueError("The file is truncated", path)
+
+    def __enter__(self) -> "MappedTypoIndex":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for view in ("_ints", "_view"):
+            if hasattr(self, view):
+                getattr(self, view).release()
+        self._mmap.close()
+        self._file.close()
+
+    def __len__(self) -> int:
+        return self._keys
+
+    def __contains__(self, typo: object) -> bool:
+        return isinstance(typo, str) and self._find(typo.encode("utf-8")) is not None
+
+    def _string(self, number: int) -> bytes:
+        ints = self._ints
+        return self._mmap[self._strings + ints[number] : self._strings + ints[number + 1]]
+
+    def _find(self, encoded: bytes) -> Optional[int]:
+        low, high = 0, self._keys
+        while low < high:
+            middle = (low + high) // 2
+            key = self._string(self._words + middle)
+            if key < encoded:
+                low = middle + 1
+            elif key > encoded:
+                high = middle
+            else:
+                return middle
+        return None
+
+    def lookup(self, typo: str) -> Tuple[str, ...]:
+        """The words which `typo` could have been intended to be, if any."""
+        found = self._find(typo.encode("utf-8"))
+        if found is None:
+            return ()
+        ints = self._ints
+        start = self._postings + ints[self._postings_offsets + found]
+        end = self._postings + ints[self._postings_offsets + found + 1]
+        return tuple(
+            self._string(ints[position]).decode("utf-8") for position in range(start, end)
+        )
+
+
+class SymmetricDeleteIndex:
+    """
+    A much smaller alternative to `TypoIndex`, in the style of SymSpell: only the words and their
+    `dropped_letter` variants are indexed. A lookup applies the same deletes to the typo, and any
+    word sharing one of those keys is then checked with `is_one_away` to see if the typo really
+    is one away from it under `handlers`.
+    Every edit `oneaway` knows about (dropped & swapped letters, proximity typos and casing)
+    leaves the word and typo with a delete in common, so nothing is missed; arbitrary extra
+    `handlers` may not have that property.
+    Each word is also indexed as itself, so looking up a correctly spelled word finds it.
+    Words which can't be indexed, being those containing whitespace, are left out and counted
+    in `skipped`. Anything else is indexed, even if `handlers` can't generate variations for it
+    (e.g. "sku1"), because `is_one_away` can still compare it.
+    """
+
+    __slots__ = ("words", "handlers", "skipped", "_index")
+
+    def __init__(
+        self,
+        words: Iterable[str],
+        handlers: Sequence[Callable[..., Iterator[str]]] = MIX_HANDLERS,
+    ) -> None:
+        self.handlers = tuple(handlers)
+        self.skipped = 0
+        indexed: List[str] = []
+        building: Dict[str, List[int]] = {}
+        for word in dict.fromkeys(words):
+            try:
+                keys = tuple(dropped_letter(word))
+            except ValueError:
+                self.skipped += 1
+                continue
+            position = len(indexed)
+            indexed.append(word)
+            building.setdefault(word, []).append(position)
+            for key in keys:
+                found = building.setdefault(key, [])
+                if not found or found[-1] != position:
+                    found.append(position)
+        self.words: Tuple[str, ...] = tuple(indexed)
+        self._index = _compact(building)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def candidates(self, typo: str) -> Tuple[int, ...]:
+        """Positions in `words` which share a delete with `typo`, before any checking."""
+        found = dict.fromkeys(_positions(self._index, typo))
+        for key in dropped_letter(typo):
+            found.update(dict.fromkeys(_positions(self._index, key)))
+        return tuple(found)
+
+    def lookup(self, typo: str) -> Tuple[str, ...]:
+        """The words which `typo` could have been intended to be, if any."""
+        matches: List[str] = []
+        for position in self.candidates(typo):
+            word = self.words[position]
+            if word == typo or is_one_away(word, typo, self.handlers):
+                matches.append(word)
+        return tuple(matches)
+
+    def memory_usage(self) -> int:
+        """
+        Approximate number of bytes held by the index, its keys & values, and the words.
+        Small integers are shared by the interpreter, so aren't counted.
+        """
+        return _memory_usage(self.words, self._index)
+
+
+class BloomFilter:
+    """
+    A compact, probabilistic, set of words: `word in bloom` is never false for a word which was
+    added, but is true for words which weren't at about the `error_rate` it was sized for.
+    For a dictionary of 500,000 words at 1% that's well under a megabyte, and rejecting a
+    non-word is a hash rather than a lookup in a much larger set.
+    Positions come from two CRC32s of each word (double hashing) rather than `hash()`, which
+    is randomised per process, so a filter saved by one process can be loaded by another.
+    """
+
+    __slots__ = ("bits", "size", "hashes")
+
+    def __init__(self, size: int, hashes: int, bits: Optional[bytearray] = None) -> None:
+        if size < 1 or hashes < 1:
+            raise ValueError("`size` and `hashes` must be positive integers", size, hashes)
+        self.size = size
+        self.hashes = hashes
+        if bits is not None and len(bits) != (size + 7) // 8:
+            raise ValueError("`bits` must be `(size + 7) // 8` bytes long", size, len(bits))
+        self.bits = bytearray((size + 7) // 8) if bits is None else bits
+
+    @classmethod
+    def from_words(cls, words: Collection[str], *, error_rate: float = 0.01) -> "BloomFilter":
+        """A filter containing `words`, sized to give false positives at about `error_rate`."""
+        if not 0 < error_rate < 1:
+            raise ValueError("`error_rate` must be between 0 and 1", error_rate)
+        count = max(len(words), 1)
+        size = max(int(math.ceil(-count * math.log(error_rate) / math.log(2) ** 2)), 8)
+        bloom = cls(size, max(int(round(size / count * math.log(2))), 1))
+        for word in words:
+            bloom.add(word)
+        return bloom
+
+    def _positions(self, word: str) -> Iterator[int]:
+        encoded = word.encode("utf-8")
+        first, second = zlib.crc32(encoded), zlib.crc32(encoded, _BLOOM_SEED) | 1
+        for number in range(self.hashes):
+            yield (first + number * second) % self.size
+
+    def add(self, word: str) -> None:
+        bits = self.bits
+        for position in self._positions(word):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, word: object) -> bool:
+        if not isinstance(word, str):
+            return False
+        # This is `_positions` inlined, as it's by far the hottest path.
+        encoded = word.encode("utf-8")
+        first, second = zlib.crc32(encoded), zlib.crc32(encoded, _BLOOM_SEED) | 1
+        size, bits = self.size, self.bits
+        for number in range(self.hashes):
+            position = (first + number * second) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def memory_usage(self) -> int:
+        """Approximate number of bytes held by the filter."""
+        return sys.getsizeof(self.bits)
+
+    def save(self, path: str) -> None:
+        """
+        Writes the filter to `path`: a magic number, the `size` and `hashes` as little-endian
+        unsigned 64 & 32bit integers, and then the bits, for `BloomFilter.load`.
+        """
+        with open(path, "wb") as f:
+            f.write(_BLOOM_MAGIC)
+            f.write(struct.pack("<QI", self.size, self.hashes))
+            f.write(self.bits)
+
+    @classmethod
+    def load(cls, path: str) -> "BloomFilter":
+        """
+        Reads a filter written by `BloomFilter.save`, raising `ValueError` if `path` isn't one,
+        or is the wrong length for the filter it says it holds.
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        header = len(_BLOOM_MAGIC) + struct.calcsize("<QI")
+        if not data.startswith(_BLOOM_MAGIC) or len(data) < header:
+            raise ValueError("Not a file written by `BloomFilter.save`", path)
+        size, hashes = struct.unpack_from("<QI", data, len(_BLOOM_MAGIC))
+        if len(data) - header != (size + 7) // 8:
+            raise ValueError("The file is truncated, or has been added to", path)
+        return cls(size, hashes, bytearray(data[header:]))
+
+
+_BLOOM_MAGIC = b"ONEBLOOM"
+_BLOOM_SEED = 0x9E3779B9
+
+
+def filter_variants(
+    variants: Iterable[str],
+    bloom: BloomFilter,
+    words: Optional[Container[str]] = None,
+) -> Iterator[str]:
+    """
+    The `variants` which are (probably) in `bloom`. If `words` is given, those are then
+    confirmed against it, so only the few which pass the filter need the exact lookup.
+    """
+    for variant in variants:
+        if variant in bloom and (words is None or variant in words):
+            yield variant
+
+
+def _join(
+    left: Iterable[str],
+    right: SymmetricDeleteIndex,
+) -> Iterator[Tuple[str, str]]:
+    handlers = right.handlers
+    for value in left:
+        try:
+            candidates = right.candidates(value)
+        except ValueError:
+            # Containing whitespace, so it couldn't have been indexed on the right either.
+            continue
+        for position in candidates:
+            other = right.words[position]
+            if other != value and (
+                is_one_away(other, value, handlers) or is_one_away(value, other, handlers)
+            ):
+                yield value, other
+
+
+_JOIN_INDEX: Optional[SymmetricDeleteIndex] = None
+"""The index of the `right` side, in each worker process of a `fuzzy_join`."""
+
+
+def _join_initializer(
+    right: Sequence[str], handlers: Tuple[Callable[..., Iterator[str]], ...]
+) -> None:
+    global _JOIN_INDEX
+    _JOIN_INDEX = SymmetricDeleteIndex(right, handlers)
+
+
+def _join_chunk(left: Tuple[str, ...]) -> List[Tuple[str, str]]:
+    """Worker side of `fuzzy_join`, which has to return something picklable."""
+    assert _JOIN_INDEX is not None
+    return list(_join(left, _JOIN_INDEX))
+
+
+def fuzzy_join(
+    left: Iterable[str],
+    right: Iterable[str],
+    handlers: Sequence[Callable[..., Iterator[str]]] = MIX_HANDLERS,
+    *,
+    processes: bool = False,
+    workers: Optional[int] = None,
+    chunksize: int = 1000,
+    ordered: bool = True,
+) -> Iterator[Tuple[str, str]]:
+    """
+    Generates the `(left, right)` pairs which are one typo apart under `handlers`, in either
+    direction, but not identical.
+    Rather than comparing everything on the left with everything on the right, `right` is put
+    in a `SymmetricDeleteIndex`, so each of `left` is only checked against the few entries
+    which share a `dropped_letter` variant with it, using `is_one_away`.
+    Values containing whitespace can't be compared like that, so are skipped on either side.
+    With `processes`, `left` is sharded into chunks of `chunksize` across `workers` processes,
+    each of which builds its own index of `right`; `workers` & `ordered` are as for `parallel`.
+    """
+    handlers = tuple(handlers)
+    if not processes:
+        return _join(left, SymmetricDeleteIndex(right, handlers))
+    return _pooled(
+        _join_chunk,
+        left,
+        workers=workers,
+        chunksize=chunksize,
+        ordered=ordered,
+        initializer=functools.partial(_join_initializer, tuple(right), handlers),
+    )
+
+
+def clusters(
+    words: Iterable[str],
+    handlers: Sequence[Callable[..., Iterator[str]]] = MIX_HANDLERS,
+) -> List[Tuple[str, ...]]:
+    """
+    Groups `words` into clusters, where each word is one typo away (in either direction) from
+    at least one other in its cluster, such as "recieve" & "receive"; words with no such
+    neighbours are clusters of one.
+    Words are compared with surrounding whitespace stripped, so "recieve " goes with "recieve",
+    but is still given as it was. Words with whitespace inside them can't be compared, so are
+    only clustered with themselves; either way every one of `words` is in exactly one cluster.
+    Neighbours come from a `SymmetricDeleteIndex`, as for `fuzzy_join`, and are merged with
+    union-find, so the work grows with the number of words rather than pairs.
+    Clusters are biggest first, and each keeps its words in the order they were first seen.
+    """
+    distinct = tuple(dict.fromkeys(words))
+    index = SymmetricDeleteIndex((word.strip() for word in distinct), handlers)
+    handlers = index.handlers
+    parents = list(range(len(index.words)))
+
+    def root(position: int) -> int:
+        while parents[position] != position:
+            # Path halving keeps the trees flat without recursion.
+            parents[position] = parents[parents[position]]
+            position = parents[position]
+        return position
+
+    for position, word in enumerate(index.words):
+        for other in index.candidates(word):
+            if other == position:
+                continue
+            first, second = root(position), root(other)
+            if first == second:
+                continue
+            candidate = index.words[other]
+            if is_one_away(candidate, word, handlers) or is_one_away(word, candidate, handlers):
+                parents[max(first, second)] = min(first, second)
+    positions = {word: position for position, word in enumerate(index.words)}
+    grouped: Dict[Union[int, str], List[str]] = {}
+    for word in distinct:
+        stripped = word.strip()
+        indexed = positions.get(stripped)
+        # Anything which wasn't indexed is only grouped with the same word, stripped.
+        grouped.setdefault(stripped if indexed is None else root(indexed), []).append(word)
+    return sorted((tuple(group) for group in grouped.values()), key=len, reverse=True)
+
+
+def cluster_sizes(groups: Iterable[Collection[str]]) -> Dict[int, int]:
+    """How many of the `clusters` there are of each size, smallest first."""
+    return dict(sorted(collections.Counter(len(group) for group in groups).items()))
+
+
+def _dictionary_snapshot(path: str) -> str:
+    """Where the normalised snapshot of the dictionary at `path`, in its current state, lives."""
+    import hashlib
+
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}".encode("utf-8")
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache, "oneaway", f"{hashlib.sha1(key).hexdigest()}.idx")
+
+
+def load_dictionary(
+    path: str = "/usr/share/dict/words", *, snapshot: bool = True
+) -> Container[str]:
+    """
+    The words in the file at `path`, one per line, stripped and lowercased.
+    Unless `snapshot` is false, those are also saved (as a `TypoIndex` of just the words) under
+    `~/.cache/oneaway/` or `$XDG_CACHE_HOME/oneaway/`, and while the file at `path` is unchanged
+    that is opened as a `MappedTypoIndex` instead, which takes next to no time at all.
+    If the snapshot can't be written, the words are returned as a frozenset.
+    """
+    snapshot_path = _dictionary_snapshot(path) if snapshot else ""
+    if snapshot:
+        try:
+            return MappedTypoIndex(snapshot_path)
+        except (OSError, ValueError):
+            pass
+    with open(path, "r") as dictionary:
+        words = frozenset(line.strip().lower() for line in dictionary)
+    if snapshot:
+        try:
+            os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+            partial_path = f"{snapshot_path}.{os.getpid()}"
+            TypoIndex(words, handlers=()).save(partial_path)
+            os.replace(partial_path, snapshot_path)
+        except OSError:
+            pass
+    return words
+
+
+def _write_variants(
+    lines: Iterable[str],
+    output: TextIO,
+    output_format: str,
+    dictionary: Container[str],
+) -> int:
+    """
+    Writes the `common` variants of the word on each of `lines` to `output` as they're
+    generated, for the CLI's --input. Words which can't be handled are reported on stderr and
+    skipped, and the number of those is returned.
+    JSON Lines output is one object per word; TSV & CSV are one `word, variant, clashes` row
+    per variant.
+    """
+    import csv
+    import json
+
+    failures = 0
+    writer = csv.writer(output, dialect="excel-tab" if output_format == "tsv" else "excel")
+    for line in lines:
+        word = line.strip()
+        if not word:
+            continue
+        try:
+            variations = tuple(common(word))
+        except ValueError as e:
+            failures += 1
+            sys.stderr.write(f"Skipping {word!r}: {e.args[0]}{os.linesep}")
+            continue
+        clashes = [
+            variation
+            for variation in variations
+            if len(variation) > 1 and variation.lower() in dictionary
+        ]
+        if output_format == "jsonl":
+            output.write(json.dumps({"word": word, "variants": variations, "clashes": clashes}))
+            output.write("\n")
+        else:
+            writer.writerows(
+                (word, variation, "1" if variation in clashes else "")
+                for variation in variations
+            )
+    output.flush()
+    return failures
+
+
+def _write_clusters(lines: Iterable[str], output: TextIO, output_format: str) -> None:
+    """
+    Writes the `mix` `clusters` of the words on `lines` with more than one word in them to
+    `output`, for the CLI's --cluster, followed by a histogram of all the cluster sizes on
+    stderr. Words are written as they were given, surrounding whitespace and all.
+    JSON Lines output is one list per cluster; TSV & CSV are one `cluster, word` row per word,
+    numbering the clusters from 1.
+    """
+    import csv
+    import json
+
+    words = [line.rstrip("\r\n") for line in lines if line.strip()]
+    groups = clusters(words)
+    writer = csv.writer(output, dialect="excel-tab" if output_format == "tsv" else "excel")
+    for number, group in enumerate(groups, start=1):
+        if len(group) < 2:
+            break
+        if output_format == "jsonl":
+            output.write(json.dumps(group))
+            output.write("\n")
+        else:
+            writer.writerows((number, word) for word in group)
+    sys.stderr.write(f"# Cluster sizes:{os.linesep}")
+    for size, count in cluster_sizes(groups).items():
+        sys.stderr.write(f"  - {size}: {count}{os.linesep}")
+
+
 if __name__ == "__main__":
     """
     Allow running from the CLI.
     """
-    import argparse, sys, os
+    import argparse
 
     parser = argparse.ArgumentParser()
     parser.add_argument(
-        "word", help="The word you want to generate off-by-one variants (typos) for."
+        "word",
+        nargs="?",
+        help="The word you want to generate off-by-one variants (typos) for.",
+    )
+    parser.add_argument(
+        "--input",
+        metavar="PATH",
+        help="Read words, one per line, from this file (or - for stdin) instead of `word`, "
+        "and write their variants as they're generated.",
+    )
+    parser.add_argument(
+        "--cluster",
+        action="store_true",
+        help="With --input, group the words into clusters of typos of each other instead, "
+        "writing each cluster of more than one word, and a histogram of sizes to stderr.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=("jsonl", "tsv", "csv"),
+        default="jsonl",
+        help="How to write variants when using --input (default: jsonl).",
+    )
+    parser.add_argument(
+        "--dictionary",
+        metavar="PATH",
+        default="/usr/share/dict/words",
+        help="Words to check variants against (default: /usr/share/dict/words).",
+    )
+    parser.add_argument(
+        "--no-dictionary",
+        action="store_true",
+        help="Don't check variants against a dictionary at all.",
     )
     args = parser.parse_args()
-    if not args.word:
+    if args.cluster and args.input is None:
+        sys.stderr.write(f"--cluster needs --input.{os.linesep}")
+        sys.exit(1)
+    if not args.word and args.input is None:
         sys.stderr.write(f"No word provided.{os.linesep}")
         sys.exit(1)
 
-    default_words: set[str] = set()
-    if os.path.exists("/usr/share/dict/words"):
+    def _default_words() -> Container[str]:
+        if args.no_dictionary or not os.path.exists(args.dictionary):
+            return frozenset()
         try:
-            with open("/usr/share/dict/words", "r") as default_dictionary:
-                default_words = {line.strip().lower() for line in default_dictionary}
+            return load_dictionary(args.dictionary)
         except Exception:
-            sys.stderr.write(f"Failed to read file /usr/share/dict/words{os.linesep}")
+            sys.stderr.write(f"Failed to read file {args.dictionary}{os.linesep}")
+            return frozenset()
 
     # The resources in pyspellchecker seem to ultimately *include* typos intentionally
     # so they aren't a good candidate for a separate dictionary 🤷
@@ -299,13 +2275,29 @@ if __name__ == "__main__":
     #         words_counts = json.loads(gzip.decompress(pyspellchecker_words).decode("utf-8"))
     #         default_words.update({line.strip().lower() for line in words_counts.keys()})
 
+    if args.cluster:
+        if args.input == "-":
+            _write_clusters(sys.stdin, sys.stdout, args.format)
+        else:
+            with open(args.input, "r") as input_file:
+                _write_clusters(input_file, sys.stdout, args.format)
+        sys.exit(0)
+
+    if args.input is not None:
+        default_words = _default_words()
+        if args.input == "-":
+            failures = _write_variants(sys.stdin, sys.stdout, args.format, default_words)
+        else:
+            with open(args.input, "r") as input_file:
+                failures = _write_variants(input_file, sys.stdout, args.format, default_words)
+        sys.exit(1 if failures else 0)
+
     sys.stdout.write(f"# Variants allowed: {os.linesep}")
     sys.stdout.write(f"  - missing letters{os.linesep}")
     sys.stdout.write(f"  - swapped letters{os.linesep}")
     sys.stdout.write(f"  - horizonal typos{os.linesep}")
-    sys.stdout.write(
-        f"# Dictionary file `/usr/share/dict/words` being used:{os.linesep}"
-    )
+    sys.stdout.write(f"# Dictionary file `{args.dictionary}` being used:{os.linesep}")
+    default_words = _default_words()
     if default_words:
         sys.stdout.write(f"  - yes{os.linesep}")
     else:
@@ -353,4 +2345,10 @@ if __name__ == "__main__":
             f"# Variations as a (naïve) regular expression alternation:{os.linesep}"
         )
         sys.stdout.write(f"  - ({alternations}){os.linesep}")
+        factored = variants_pattern(variations)
+        sys.stdout.write(
+            f"# Variations as a prefix-factored regular expression "
+            f"({len(factored)} characters, rather than {len(alternations) + 2}):{os.linesep}"
+        )
+        sys.stdout.write(f"  - {factored}{os.linesep}")
     sys.exit(0)
@@ -0,0 +1,287 @@
+"""
+A small asyncio HTTP server answering typo lookups & variant generation, so that a typo index
+can be loaded once and shared, e.g. as a sidecar. Run with::
+
+    python -m oneaway_serve --index words.idx --port 8080
+    python -m oneaway_serve --words /usr/share/dict/words --unix /tmp/oneaway.sock
+
+Everything is JSON, and connections are kept alive unless the client asks otherwise:
+ - ``GET /lookup?q=tset&q=...`` gives the words each ``q`` could be a typo of.
+ - ``GET /generate?q=test&preset=common`` gives the variations on each ``q``.
+ - ``POST /batch`` with ``{"lookup": [...], "generate": [...], "preset": "mix"}`` does both for
+   as many words as you like in one request.
+ - ``GET /metrics`` gives a latency histogram for each of the above.
+"""
+import asyncio
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+import oneaway
+
+__all__ = [
+    "LatencyHistogram",
+    "Server",
+]
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+"""Upper bounds, in seconds, of the buckets of a `LatencyHistogram`."""
+
+MAX_BODY = 1024 * 1024
+"""The biggest request body which will be read, in bytes."""
+
+PRESETS = {
+    "common": oneaway.COMMON_HANDLERS,
+    "mix": oneaway.MIX_HANDLERS,
+}
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+class LatencyHistogram:
+    """Counts of how long requests took, in the buckets of `LATENCY_BUCKETS`."""
+
+    __slots__ = ("counts", "total", "seconds")
+
+    def __init__(self) -> None:
+        # The extra, last, bucket is for anything slower than the biggest bound.
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0
+        self.seconds = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += 1
+        self.seconds += seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        buckets = [f"{bound * 1000:g}ms" for bound in LATENCY_BUCKETS] + ["+Inf"]
+        return {
+            "count": self.total,
+            "sum_seconds": self.seconds,
+            "buckets": dict(zip(buckets, self.counts)),
+        }
+
+
+class BadRequest(Exception):
+    def __init__(self, message: str, status: int = 400) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class Server:
+    """
+    Answers requests against `index`, which is anything with a `lookup(typo)` method, such as a
+    `oneaway.MappedTypoIndex`, `oneaway.TypoIndex` or `oneaway.SymmetricDeleteIndex`.
+    Generated variations are cached for the `cache_size` most recently asked for words.
+    Requests are answered on the event loop's default thread pool, so that one big batch
+    doesn't hold up every other connection while it's worked out.
+    """
+
+    def __init__(
+        self,
+        index: Union[oneaway.TypoIndex, oneaway.MappedTypoIndex, oneaway.SymmetricDeleteIndex],
+        *,
+        cache_size: int = 4096,
+    ) -> None:
+        self.index = index
+        self.generators = {
+            name: oneaway.cached(handlers, maxsize=cache_size)
+            for name, handlers in PRESETS.items()
+        }
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.histograms_lock = threading.Lock()
+        self.routes: Dict[Tuple[str, str], Callable[[Dict[str, List[str]], bytes], Any]] = {
+            ("GET", "/lookup"): self.get_lookup,
+            ("GET", "/generate"): self.get_generate,
+            ("POST", "/batch"): self.post_batch,
+            ("GET", "/metrics"): self.get_metrics,
+        }
+
+    def lookup(self, words: List[str]) -> Dict[str, Any]:
+        results: Dict[str, Any] = {}
+        for word in words:
+            try:
+                results[word] = list(self.index.lookup(word))
+            except ValueError as e:
+                results[word] = {"error": e.args[0]}
+        return results
+
+    def generate(self, words: List[str], preset: object) -> Dict[str, Any]:
+        if not isinstance(preset, str) or preset not in self.generators:
+            raise BadRequest(f"Unknown preset {preset!r}, expected one of {list(PRESETS)}")
+        generator = self.generators[preset]
+        results: Dict[str, Any] = {}
+        for word in words:
+            try:
+                results[word] = generator(word)
+            except ValueError as e:
+                results[word] = {"error": e.args[0]}
+        return results
+
+    def get_lookup(self, query: Dict[str, List[str]], body: bytes) -> Any:
+        return self.lookup(query.get("q", []))
+
+    def get_generate(self, query: Dict[str, List[str]], body: bytes) -> Any:
+        return self.generate(query.get("q", []), query.get("preset", ["common"])[-1])
+
+    def post_batch(self, query: Dict[str, List[str]], body: bytes) -> Any:
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            raise BadRequest("The body must be JSON")
+        if not isinstance(request, dict):
+            raise BadRequest("The body must be a JSON object")
+        lookup, generate = request.get("lookup", []), request.get("generate", [])
+        for words in (lookup, generate):
+            if not isinstance(words, list) or not all(isinstance(word, str) for word in words):
+                raise BadRequest("`lookup` and `generate` must be lists of strings")
+        return {
+            "lookup": self.lookup(lookup),
+            "generate": self.generate(generate, request.get("preset", "common")),
+        }
+
+    def get_metrics(self, query: Dict[str, List[str]], body: bytes) -> Any:
+        with self.histograms_lock:
+            return {path: histogram.as_dict() for path, histogram in self.histograms.items()}
+
+    def respond(self, method: str, target: str, body: bytes) -> Tuple[int, bytes]:
+        """The status & JSON body for a request, timing it in the histogram for its path."""
+        start = time.perf_counter()
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path))
+        try:
+            if handler is None:
+                if any(path == url.path for _, path in self.routes):
+                    raise BadRequest(f"{method} isn't allowed for {url.path}", status=405)
+                raise BadRequest(f"Nothing at {url.path}", status=404)
+            status, result = 200, handler(parse_qs(url.query), body)
+        except BadRequest as e:
+            status, result = e.status, {"error": str(e)}
+        except Exception as e:
+            # Anything else is a bug, but is better answered than dropping the connection.
+            status, result = 500, {"error": f"{e.__class__.__name__}: {e}"}
+        if handler is not None:
+            with self.histograms_lock:
+                if url.path not in self.histograms:
+                    self.histograms[url.path] = LatencyHistogram()
+                self.histograms[url.path].observe(time.perf_counter() - start)
+        return status, json.dumps(result).encode("utf-8")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serves HTTP/1.1 requests from one connection until it's closed."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close" and (
+                    version == "HTTP/1.1" or headers.get("connection", "").lower() == "keep-alive"
+                )
+                try:
+                    length = int(headers.get("content-length", "0"))
+                except ValueError:
+                    length = -1
+                if length < 0 or length > MAX_BODY:
+                    status, payload = 413 if length > 0 else 400, b'{"error": "Bad body"}'
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = await asyncio.get_running_loop().run_in_executor(
+                        None, self.respond, method, target, body
+                    )
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                    f"\r\n".encode("latin-1")
+                    + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(
+        self,
+        *,
+        host: Optional[str] = "127.0.0.1",
+        port: int = 8080,
+        unix: Optional[str] = None,
+    ) -> None:
+        if unix is not None:
+            server = await asyncio.start_unix_server(self.handle, path=unix)
+        else:
+            server = await asyncio.start_server(self.handle, host=host, port=port)
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    """
+    Allow running from the CLI.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument(
+        "--index",
+        metavar="PATH",
+        help="A file written by `oneaway.TypoIndex.save`, which is opened via mmap.",
+    )
+    source.add_argument(
+        "--words",
+        metavar="PATH",
+        help="Words, one per line, to build a `oneaway.SymmetricDeleteIndex` from.",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--unix", metavar="PATH", help="Listen on this Unix socket instead.")
+    parser.add_argument("--cache-size", type=int, default=4096)
+    args = parser.parse_args()
+
+    index: Union[oneaway.MappedTypoIndex, oneaway.SymmetricDeleteIndex]
+    if args.index:
+        index = oneaway.MappedTypoIndex(args.index)
+    else:
+        with open(args.words, "r") as words:
+            index = oneaway.SymmetricDeleteIndex(
+                word for word in (line.strip().lower() for line in words) if word
+            )
+    sys.stderr.write(f"Loaded {len(index)} keys{os.linesep}")
+    try:
+        asyncio.run(
+            Server(index, cache_size=args.cache_size).serve(
+                host=args.host, port=args.port, unix=args.unix
+            )
+        )
+    except KeyboardInterrupt:
+        pass